@@ -3,12 +3,24 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_cors import CORS
+from .tmdb import tmdb
+from .upstream import upstream
+from .scheduler import scheduler
+from .passwords import hasher
+from .throttle import throttle
+from .querycount import query_counter
+from .serializers import OrjsonProvider, orjson
 
 db = SQLAlchemy()
 migrate = Migrate()
 
 def create_app():
+    from .auth import load_secret_key
+    from .revocation import revocations
+
     app = Flask(__name__, static_url_path='/static', static_folder='static')
+    if orjson is not None and os.getenv('JSON_ORJSON', '1') == '1':
+        app.json = OrjsonProvider(app)
     
     frontend_urls = os.getenv('FRONTEND_URL', '').split(',') if os.getenv('FRONTEND_URL') else []
     allowed_origins = [
@@ -24,18 +36,89 @@ def create_app():
     CORS(app, 
          origins=allowed_origins,
          methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'],
-         allow_headers=['Content-Type', 'Authorization', 'Accept', 'X-Requested-With'],
+         allow_headers=['Content-Type', 'Authorization', 'Accept', 'X-Requested-With', 'If-None-Match'],
          supports_credentials=True,
-         expose_headers=['Content-Range', 'X-Content-Range'])
+         expose_headers=['Content-Range', 'X-Content-Range', 'ETag', 'X-Query-Count', 'X-Query-Budget-Exceeded'])
     
     database_url = os.getenv('DATABASE_URL', 'sqlite:///netflix_clone.db')
     app.config['SQLALCHEMY_DATABASE_URI'] = database_url
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SECRET_KEY'] = load_secret_key(app)
+    app.config['AUTH_TOKEN_TTL'] = int(os.getenv('AUTH_TOKEN_TTL', str(60 * 60 * 24 * 7)))
+    app.config['REVOCATION_CAPACITY'] = int(os.getenv('REVOCATION_CAPACITY', '100000'))
+    app.config['REVOCATION_REFRESH_INTERVAL'] = float(os.getenv('REVOCATION_REFRESH_INTERVAL', '5'))
+    app.config['PASSWORD_HASH_METHOD'] = os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))
+    app.config['PASSWORD_HASH_MAX_PENDING'] = int(os.getenv('PASSWORD_HASH_MAX_PENDING', '16'))
+    app.config['QUERY_COUNTER'] = os.getenv('QUERY_COUNTER', '0') == '1'
+    app.config['STATS_ENDPOINTS_ENABLED'] = os.getenv('STATS_ENDPOINTS_ENABLED', '0') == '1'
+    app.config['USER_PAYLOAD_TTL'] = int(os.getenv('USER_PAYLOAD_TTL', '30'))
+    app.config['PROFILE_LIST_TTL'] = int(os.getenv('PROFILE_LIST_TTL', '300'))
+    app.config['PROFILE_LIST_CACHE_PATH'] = os.getenv(
+        'PROFILE_LIST_CACHE_PATH', os.path.join(app.instance_path, 'profile_list_cache.db'))
+    app.config['THROTTLE_LOGIN_PER_IP'] = os.getenv('THROTTLE_LOGIN_PER_IP', '20/60')
+    app.config['THROTTLE_LOGIN_PER_EMAIL'] = os.getenv('THROTTLE_LOGIN_PER_EMAIL', '10/300')
+    app.config['THROTTLE_REGISTER_PER_IP'] = os.getenv('THROTTLE_REGISTER_PER_IP', '10/3600')
+    app.config['THROTTLE_TABLE_PATH'] = os.getenv(
+        'THROTTLE_TABLE_PATH', os.path.join(app.instance_path, 'throttle.bin'))
+    app.config['THROTTLE_TABLE_SLOTS'] = int(os.getenv('THROTTLE_TABLE_SLOTS', '65536'))
+    app.config['TRUSTED_PROXIES'] = int(os.getenv('TRUSTED_PROXIES', '0'))
+    
+    app.config['TMDB_BASE_URL'] = os.getenv('TMDB_BASE_URL', 'https://api.themoviedb.org/3')
+    app.config['TMDB_API_KEY'] = os.getenv('TMDB_API_KEY', '')
+    app.config['TMDB_TIMEOUT'] = float(os.getenv('TMDB_TIMEOUT', '10'))
+    app.config['UPSTREAM_POOL_SIZE'] = int(os.getenv('UPSTREAM_POOL_SIZE', '16'))
+    app.config['UPSTREAM_CONCURRENCY'] = int(os.getenv('UPSTREAM_CONCURRENCY', '32'))
+    app.config['UPSTREAM_RATE_LIMIT'] = float(os.getenv('UPSTREAM_RATE_LIMIT', '40'))
+    app.config['UPSTREAM_RATE_BURST'] = float(os.getenv('UPSTREAM_RATE_BURST', '40'))
+    app.config['UPSTREAM_RATE_MAX_WAIT'] = float(os.getenv('UPSTREAM_RATE_MAX_WAIT', '1'))
+    app.config['UPSTREAM_RATE_LIMIT_PATH'] = os.getenv(
+        'UPSTREAM_RATE_LIMIT_PATH', os.path.join(app.instance_path, 'upstream_rate.db'))
+    app.config['UPSTREAM_BREAKER_ERROR_RATE'] = float(os.getenv('UPSTREAM_BREAKER_ERROR_RATE', '0.5'))
+    app.config['UPSTREAM_BREAKER_MIN_CALLS'] = int(os.getenv('UPSTREAM_BREAKER_MIN_CALLS', '20'))
+    app.config['UPSTREAM_BREAKER_WINDOW'] = float(os.getenv('UPSTREAM_BREAKER_WINDOW', '30'))
+    app.config['UPSTREAM_BREAKER_COOLDOWN'] = float(os.getenv('UPSTREAM_BREAKER_COOLDOWN', '15'))
+    app.config['CATALOG_CACHE_PATH'] = os.getenv(
+        'CATALOG_CACHE_PATH', os.path.join(app.instance_path, 'catalog_cache.db'))
+    app.config['CATALOG_CACHE_MAX_ENTRIES'] = int(os.getenv('CATALOG_CACHE_MAX_ENTRIES', '2048'))
+    app.config['TMDB_IMAGE_BASE_URL'] = os.getenv('TMDB_IMAGE_BASE_URL', 'https://image.tmdb.org/t/p')
+    app.config['IMAGE_CACHE_DIR'] = os.getenv('IMAGE_CACHE_DIR', os.path.join(app.instance_path, 'images'))
+    app.config['IMAGE_WORKERS'] = int(os.getenv('IMAGE_WORKERS', '2'))
+    app.config['IMAGE_VARIANT_TIMEOUT'] = float(os.getenv('IMAGE_VARIANT_TIMEOUT', '10'))
+    app.config['CATALOG_STALE_TTL'] = int(os.getenv('CATALOG_STALE_TTL', str(60 * 60 * 24)))
+    app.config['CATALOG_REFRESH_CONCURRENCY'] = int(os.getenv('CATALOG_REFRESH_CONCURRENCY', '4'))
+    app.config['CATALOG_REFRESH_MAX_PENDING'] = int(os.getenv('CATALOG_REFRESH_MAX_PENDING', '1000'))
+    app.config['CATALOG_SCHEDULER_ENABLED'] = os.getenv('CATALOG_SCHEDULER_ENABLED', '1') == '1'
+    app.config['HOME_ROWS_INTERVAL'] = int(os.getenv('HOME_ROWS_INTERVAL', '900'))
+    app.config['HOME_ROWS_LANGUAGES'] = os.getenv('HOME_ROWS_LANGUAGES', 'en-US').split(',')
+    app.config['CERTIFICATIONS_INTERVAL'] = int(os.getenv('CERTIFICATIONS_INTERVAL', '3600'))
+    app.config['ELIGIBILITY_INTERVAL'] = int(os.getenv('ELIGIBILITY_INTERVAL', '3600'))
+    app.config['PREFETCH_SIMILAR'] = int(os.getenv('PREFETCH_SIMILAR', '0'))
+    app.config['PREFETCH_WORKERS'] = int(os.getenv('PREFETCH_WORKERS', '2'))
+    app.config['PREFETCH_RATE'] = float(os.getenv('PREFETCH_RATE', '2'))
     
     db.init_app(app)
     migrate.init_app(app, db)
+    upstream.init_app(app)
+    tmdb.init_app(app)
+    scheduler.init_app(app)
+    hasher.init_app(app)
+    throttle.init_app(app)
+    revocations.init_app(app)
+    query_counter.init_app(app)
     
     from .routes import api
+    from .catalog import catalog, schedule_jobs
+    from .images import images, image_store
+    from .prefetch import prefetcher
+    from .users import user_payloads, profile_lists
     app.register_blueprint(api, url_prefix='/api')
+    app.register_blueprint(catalog, url_prefix='/api/catalog')
+    app.register_blueprint(images, url_prefix='/api/images')
+    image_store.init_app(app)
+    prefetcher.init_app(app)
+    user_payloads.init_app(app)
+    profile_lists.init_app(app)
+    schedule_jobs(app)
     
     return app
\ No newline at end of file
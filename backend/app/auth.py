@@ -0,0 +1,137 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+from functools import wraps
+from flask import current_app, g, jsonify, request
+from .revocation import revocations
+from .users import current_identity
+
+TOKEN_PREFIX = 'ss1'
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def load_secret_key(app):
+    """SECRET_KEY from the environment, or a random key kept in the instance folder.
+
+    The instance file is shared by every worker on the host, so tokens
+    issued by one worker verify in all of them.
+    """
+    key = os.getenv('SECRET_KEY')
+    if key:
+        return key
+    path = os.path.join(app.instance_path, 'secret_key')
+    try:
+        with open(path) as key_file:
+            return key_file.read().strip()
+    except FileNotFoundError:
+        pass
+    os.makedirs(app.instance_path, exist_ok=True)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'w') as key_file:
+            key_file.write(secrets.token_hex(32))
+    except FileExistsError:
+        # Another worker created it first
+        pass
+    with open(path) as key_file:
+        return key_file.read().strip()
+
+
+def _sign(payload):
+    key = current_app.config['SECRET_KEY'].encode()
+    return _b64encode(hmac.new(key, f'{TOKEN_PREFIX}.{payload}'.encode(), hashlib.sha256).digest())
+
+
+def issue_token(user_id, plan, ttl=None):
+    """Signed token carrying the user id, subscription plan, expiry and a unique id for revocation"""
+    claims = {
+        'sub': user_id,
+        'plan': plan,
+        'exp': int(time.time() + (ttl or current_app.config['AUTH_TOKEN_TTL'])),
+        'jti': secrets.token_hex(8),
+    }
+    payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode())
+    return f'{TOKEN_PREFIX}.{payload}.{_sign(payload)}'
+
+
+def verify_token(token):
+    """Return the token's claims, or None if it is malformed, forged or expired"""
+    try:
+        prefix, payload, signature = token.split('.')
+    except ValueError:
+        return None
+    # Compared as bytes: compare_digest rejects non-ASCII str with a TypeError
+    if prefix != TOKEN_PREFIX or not hmac.compare_digest(
+            signature.encode('utf-8', 'surrogateescape'), _sign(payload).encode()):
+        return None
+    try:
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        return None
+    if claims.get('exp', 0) <= time.time():
+        return None
+    return claims
+
+
+def require_auth(view):
+    """Reject requests without a valid bearer token; the claims are left on ``g.claims``"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        auth_header = request.headers.get('Authorization')
+        if not auth_header or not auth_header.startswith('Bearer '):
+            return jsonify({'error': 'No valid token provided'}), 401
+
+        claims = verify_token(auth_header[len('Bearer '):])
+        if claims is None:
+            return jsonify({'error': 'Invalid or expired token'}), 401
+        if revocations.is_revoked(claims.get('jti')):
+            return jsonify({'error': 'Token has been revoked'}), 401
+        g.claims = claims
+        return view(*args, **kwargs)
+    return wrapper
+
+
+# Use both below ``require_auth``. Someone else's resource answers 404, the
+# same as a missing one.
+def require_account_owner(view):
+    """The ``user_id`` must be the token's own; checked without a query"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if kwargs['user_id'] != g.claims['sub']:
+            return jsonify({'error': 'User not found'}), 404
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def require_profile_owner(view):
+    """The ``profile_id`` must belong to the user, per the identity loaded once per request"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        identity = current_identity()
+        if identity is None:
+            return jsonify({'error': 'User no longer exists'}), 401
+        if not identity.owns_profile(kwargs['profile_id']):
+            return jsonify({'error': 'Profile not found'}), 404
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def require_stats_enabled(view):
+    """Operational counters are only served with STATS_ENDPOINTS_ENABLED=1; otherwise 404"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_app.config['STATS_ENDPOINTS_ENABLED']:
+            return jsonify({'error': 'Not found'}), 404
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,99 @@
+import json
+import random
+import threading
+from flask import current_app
+from .certifications import get_certifications
+from .titles import pick_logo, pick_trailer
+from .tmdb import tmdb
+from .upstream import upstream
+
+POOL_TTL = 60 * 30
+MAX_CANDIDATES = 20
+
+
+def image_url(size, file_path):
+    return f"/api/images/{size}/{file_path.lstrip('/')}" if file_path else None
+
+
+def banner_candidate(item):
+    """Attach trailer and logo to a trending title, or None if either is missing"""
+    media_type = item['media_type']
+    videos = tmdb.get_json(f"{media_type}/{item['id']}/videos")
+    images = tmdb.get_json(f"{media_type}/{item['id']}/images")
+    trailer = pick_trailer(videos)
+    logo = pick_logo(images)
+    if not trailer or not logo:
+        return None
+    return dict(
+        item,
+        trailer=trailer,
+        logo_path=logo,
+        logo_url=image_url('w500', logo),
+        backdrop_url=image_url('original', item['backdrop_path']),
+    )
+
+
+def build_banner_pool(language='en-US'):
+    """Trending titles that have a backdrop, logo and trailer, pre-serialized one by one"""
+    results = tmdb.get_json('trending/all/week', {'language': language}).get('results') or []
+    candidates = [
+        item for item in results
+        if item.get('backdrop_path') and item.get('media_type') in ('movie', 'tv')
+    ][:MAX_CANDIDATES]
+
+    # Each candidate makes two calls one after the other
+    results = upstream.gather(
+        {index: (lambda item=item: banner_candidate(item)) for index, item in enumerate(candidates)},
+        timeout=tmdb.timeout * 2
+    )
+    pool = []
+    for index in range(len(candidates)):
+        candidate, error = results[index]
+        if error is not None:
+            print(f"Banner candidate failed: {str(error)}")
+        elif candidate:
+            pool.append(candidate)
+
+    certifications = get_certifications([(item['media_type'], item['id']) for item in pool])
+    for item in pool:
+        item['certification'] = certifications.get((item['media_type'], item['id']), '')
+    return json.dumps(pool).encode()
+
+
+class BannerPool:
+    """Picks a random banner from the cached pool without re-parsing it per request"""
+
+    def __init__(self):
+        self._parsed = {}
+        self._lock = threading.Lock()
+
+    def _items(self, body):
+        with self._lock:
+            cached = self._parsed.get(body)
+        if cached is None:
+            cached = [json.dumps(item).encode() for item in json.loads(body)]
+            with self._lock:
+                # Only the current pool per language is worth keeping
+                if len(self._parsed) > 8:
+                    self._parsed.clear()
+                self._parsed[body] = cached
+        return cached
+
+    def pick(self, language='en-US'):
+        app = current_app._get_current_object()
+
+        def load():
+            # Stale pools are rebuilt by the background refresher, outside the request
+            with app.app_context():
+                return build_banner_pool(language)
+
+        body, _ = tmdb.cached(f'banner-pool:{language}', POOL_TTL, load, cross_worker=False)
+        items = self._items(body)
+        return random.choice(items) if items else None
+
+
+banner_pool = BannerPool()
+
+
+def warm_banner_pool(language='en-US'):
+    tmdb.cache.set(f'banner-pool:{language}', build_banner_pool(language), POOL_TTL, tmdb.stale_ttl)
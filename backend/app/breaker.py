@@ -0,0 +1,113 @@
+import itertools
+import threading
+import time
+from collections import deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Fails fast once upstream errors spike, per worker.
+
+    The circuit opens when at least ``min_calls`` calls were made in the
+    last ``window`` seconds and ``error_rate`` of them failed. After
+    ``cooldown`` seconds one probe call is let through; success closes the
+    circuit and failure keeps it open for another cooldown. A probe that
+    never reports back is replaced after a further cooldown.
+
+    ``allow()`` hands out a ticket that goes back with ``record()``, so
+    while the circuit is not closed only the current probe's outcome
+    counts, not calls that started earlier.
+    """
+
+    def __init__(self, error_rate=0.5, min_calls=20, window=30, cooldown=15):
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self._outcomes = deque()  # (timestamp, failed)
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started = None
+        self._probe = None
+        self._probe_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._counters = {'opened': 0, 'short_circuited': 0, 'probes': 0}
+
+    def configure(self, error_rate, min_calls, window, cooldown):
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.cooldown = cooldown
+
+    def _trim(self, now):
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            _, failed = self._outcomes.popleft()
+            self._failures -= failed
+
+    def allow(self):
+        """A ticket for a call that may go upstream now, or None.
+
+        Ordinary calls get 0 and a probe gets its own number.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return 0
+            now = time.monotonic()
+            if self.state == OPEN and now - self._opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and (
+                self._probe_started is None or now - self._probe_started >= self.cooldown
+            ):
+                self._probe_started = now
+                self._probe = next(self._probe_ids)
+                self._counters['probes'] += 1
+                return self._probe
+            self._counters['short_circuited'] += 1
+            return None
+
+    def record(self, failed, ticket=0):
+        now = time.monotonic()
+        with self._lock:
+            if self.state != CLOSED:
+                if not ticket or ticket != self._probe:
+                    # A call that started before the circuit opened, or a
+                    # probe that was already replaced
+                    return
+                self._probe_started = None
+                self._probe = None
+                if failed:
+                    self.state = OPEN
+                    self._opened_at = now
+                else:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                    self._failures = 0
+                return
+
+            self._outcomes.append((now, failed))
+            self._failures += failed
+            self._trim(now)
+            calls = len(self._outcomes)
+            if calls >= self.min_calls and self._failures >= calls * self.error_rate:
+                self.state = OPEN
+                self._opened_at = now
+                self._counters['opened'] += 1
+                print(f"Upstream circuit opened after {self._failures} failures in {calls} calls")
+
+    @property
+    def is_open(self):
+        return self.state != CLOSED
+
+    def stats(self):
+        with self._lock:
+            self._trim(time.monotonic())
+            return dict(
+                self._counters,
+                state=self.state,
+                window_calls=len(self._outcomes),
+                window_failures=self._failures,
+            )
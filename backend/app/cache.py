@@ -0,0 +1,224 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """In-process LRU cache with a TTL per entry"""
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value, expires_at
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """On-disk cache shared by every worker on the host; survives restarts.
+
+    Values are stored as ``(value, fresh_until)`` pairs and kept until
+    ``expires_at`` so stale copies can still be served while refreshing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache_entry ('
+            'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL, '
+            'fresh_until REAL NOT NULL DEFAULT 0)'
+        )
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(cache_entry)')}
+        if 'fresh_until' not in columns:
+            # Cache files from before stale-while-revalidate; old rows count as stale
+            conn.execute('ALTER TABLE cache_entry ADD COLUMN fresh_until REAL NOT NULL DEFAULT 0')
+
+    def _connect(self):
+        # Connections are per thread and per process so forked gunicorn
+        # workers never share a handle inherited from the master.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            'SELECT value, fresh_until, expires_at FROM cache_entry WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None or row[2] <= time.time():
+            return None
+        return (bytes(row[0]), row[1]), row[2]
+
+    def set(self, key, value, expires_at):
+        value, fresh_until = value
+        self._connect().execute(
+            'INSERT OR REPLACE INTO cache_entry (key, value, fresh_until, expires_at) '
+            'VALUES (?, ?, ?, ?)',
+            (key, value, fresh_until, expires_at)
+        )
+
+    def delete(self, key):
+        self._connect().execute('DELETE FROM cache_entry WHERE key = ?', (key,))
+
+    def invalidate(self, key, hold):
+        """Replace an entry with an empty marker that blocks older ``fill`` calls for ``hold`` seconds"""
+        now = time.time()
+        self._connect().execute(
+            'INSERT OR REPLACE INTO cache_entry (key, value, fresh_until, expires_at) VALUES (?, ?, ?, ?)',
+            (key, b'', now, now + hold)
+        )
+
+    def fill(self, key, value, expires_at, started_at):
+        """Set unless the key was invalidated after ``started_at``, when the value was read.
+
+        Keeps a worker that read before another worker's write from
+        caching what it read afterwards. Returns whether it was stored.
+        """
+        value, fresh_until = value
+        cursor = self._connect().execute(
+            'INSERT OR REPLACE INTO cache_entry (key, value, fresh_until, expires_at) '
+            'SELECT ?, ?, ?, ? WHERE NOT EXISTS ('
+            "SELECT 1 FROM cache_entry WHERE key = ? AND value = x'' AND fresh_until >= ?)",
+            (key, value, fresh_until, expires_at, key, started_at)
+        )
+        return cursor.rowcount > 0
+
+    def purge_expired(self):
+        cursor = self._connect().execute(
+            'DELETE FROM cache_entry WHERE expires_at <= ?', (time.time(),)
+        )
+        return cursor.rowcount
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM cache_entry').fetchone()[0]
+
+
+class TieredCache:
+    """Memory LRU in front of the shared on-disk cache, storing raw bytes.
+
+    Entries are fresh for ``ttl`` seconds and may then be served stale for
+    a further ``stale_ttl`` seconds while a refresh is in progress.
+    """
+
+    def __init__(self, memory, disk):
+        self.memory = memory
+        self.disk = disk
+        self._lock = threading.Lock()
+        self._counters = {'memory_hits': 0, 'disk_hits': 0, 'stale_hits': 0, 'misses': 0, 'writes': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _read_disk(self, key):
+        try:
+            entry = self.disk.get(key)
+        except sqlite3.Error as e:
+            print(f"Disk cache read error: {str(e)}")
+            return None
+        if entry is not None:
+            self.memory.set(key, *entry)
+        return entry
+
+    def get(self, key):
+        """Return ``(value, tier, fresh)`` or ``(None, None, False)`` on a miss"""
+        tier = 'memory'
+        entry = self.memory.get(key)
+        if entry is None:
+            tier = 'disk'
+            entry = self._read_disk(key)
+
+        if entry is None:
+            self._count('misses')
+            return None, None, False
+
+        (value, fresh_until), _ = entry
+        fresh = fresh_until > time.time()
+        self._count(f'{tier}_hits' if fresh else 'stale_hits')
+        return value, tier, fresh
+
+    def reload(self, key):
+        """Re-read a key from disk, e.g. once another worker may have filled it.
+
+        Returns ``(value, fresh)`` or None.
+        """
+        entry = self._read_disk(key)
+        if entry is None:
+            return None
+        (value, fresh_until), _ = entry
+        return value, fresh_until > time.time()
+
+    def peek(self, key):
+        """Whether a fresh entry exists, without counting a lookup"""
+        entry = self.memory.get(key)
+        if entry is None:
+            try:
+                entry = self.disk.get(key)
+            except sqlite3.Error:
+                return False
+        return entry is not None and entry[0][1] > time.time()
+
+    def set(self, key, value, ttl, stale_ttl=0):
+        fresh_until = time.time() + ttl
+        expires_at = fresh_until + stale_ttl
+        self.memory.set(key, (value, fresh_until), expires_at)
+        try:
+            self.disk.set(key, (value, fresh_until), expires_at)
+        except sqlite3.Error as e:
+            print(f"Disk cache write error: {str(e)}")
+        self._count('writes')
+
+    def delete(self, key):
+        self.memory.delete(key)
+        try:
+            self.disk.delete(key)
+        except sqlite3.Error as e:
+            print(f"Disk cache delete error: {str(e)}")
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        lookups = counters['memory_hits'] + counters['disk_hits'] + counters['stale_hits'] + counters['misses']
+        hits = lookups - counters['misses']
+        counters['hit_ratio'] = round(hits / lookups, 4) if lookups else 0.0
+        counters['memory_entries'] = len(self.memory)
+        return counters
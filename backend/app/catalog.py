@@ -0,0 +1,197 @@
+from datetime import timedelta
+import click
+from flask import Blueprint, current_app, request, jsonify, Response
+from sqlalchemy.exc import DBAPIError
+from .tmdb import tmdb, ttl_for, UpstreamError
+from .eligibility import parse_titles, get_eligibility, refresh_eligibility, MAX_BATCH_SIZE
+from .certifications import refresh_certifications
+from .titles import get_title_document, TITLE_TTL
+from .search import search_page
+from .home_rows import home_rows, build_home_rows
+from .scheduler import scheduler
+from .mirror import search_local, ingest_dump
+from .banner import banner_pool, warm_banner_pool
+from .prefetch import prefetcher
+from .auth import require_stats_enabled
+from . import db
+
+catalog = Blueprint('catalog', __name__)
+
+
+def schedule_jobs(app):
+    def build_all_home_rows():
+        for language in app.config['HOME_ROWS_LANGUAGES']:
+            build_home_rows(language)
+
+    def warm_all_banner_pools():
+        for language in app.config['HOME_ROWS_LANGUAGES']:
+            warm_banner_pool(language)
+
+    scheduler.add_job('home-rows', build_all_home_rows, app.config['HOME_ROWS_INTERVAL'])
+    scheduler.add_job('banner-pool', warm_all_banner_pools, app.config['HOME_ROWS_INTERVAL'])
+    scheduler.add_job('certifications', refresh_certifications, app.config['CERTIFICATIONS_INTERVAL'])
+    scheduler.add_job('eligibility', refresh_eligibility, app.config['ELIGIBILITY_INTERVAL'])
+
+
+def cached_response(body, tier, max_age):
+    response = Response(body, mimetype='application/json')
+    response.headers['X-Cache'] = f'HIT-{tier.upper()}' if tier else 'MISS'
+    response.headers['Cache-Control'] = f'public, max-age={max_age}'
+    return response
+
+
+@catalog.route("/stats", methods=['GET'])
+@require_stats_enabled
+def get_catalog_stats():
+    """Cache hit ratios and upstream latency for this worker"""
+    return jsonify(dict(tmdb.stats(), prefetch=prefetcher.stats())), 200
+
+
+@catalog.route("/eligibility", methods=['POST'])
+def batch_eligibility():
+    """Report which titles have trailers and logos in one round trip"""
+    data = request.get_json(silent=True) or {}
+    try:
+        pairs = parse_titles(data.get('titles'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if len(pairs) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'At most {MAX_BATCH_SIZE} titles per request'}), 400
+
+    try:
+        return jsonify({'titles': get_eligibility(pairs)}), 200
+    except Exception as e:
+        print(f"Eligibility error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@catalog.route("/home", methods=['GET'])
+def get_home_rows():
+    """Every home row in one response, served from the materialized rows"""
+    language = request.args.get('language', 'en-US')
+    try:
+        body = home_rows.get(language)
+    except Exception as e:
+        print(f"Home rows error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+    if body is None:
+        return jsonify({'error': 'Home rows are not built yet'}), 503
+    response = Response(body, mimetype='application/json')
+    response.headers['Cache-Control'] = 'public, max-age=60'
+    return response
+
+
+@catalog.route("/banner", methods=['GET'])
+def get_banner():
+    """A random trending title with its backdrop, logo and trailer"""
+    try:
+        body = banner_pool.pick(request.args.get('language', 'en-US'))
+    except UpstreamError as e:
+        print(f"Banner error: {str(e)}")
+        return jsonify({'error': str(e)}), 502
+
+    if body is None:
+        return jsonify({'error': 'No banner available'}), 404
+    response = Response(body, mimetype='application/json')
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+@catalog.route("/title/<string:media_type>/<int:tmdb_id>", methods=['GET'])
+def get_title(media_type, tmdb_id):
+    """Details, credits, similar, certification, trailer and logo in one document"""
+    if media_type not in ('movie', 'tv'):
+        return jsonify({'error': 'Invalid title type'}), 400
+
+    try:
+        language = request.args.get('language', 'en-US')
+        prefetcher.record_request(media_type, tmdb_id, language)
+        body, tier = get_title_document(media_type, tmdb_id, language)
+        response = cached_response(body, tier, min(TITLE_TTL, 300))
+        # Warm the similar titles once this response has gone out
+        app = current_app._get_current_object()
+        response.call_on_close(lambda: prefetcher.schedule(app, body, language))
+        return response
+    except UpstreamError as e:
+        print(f"Title document error: {str(e)}")
+        return jsonify({'error': str(e)}), e.status if e.status < 500 or e.status == 504 else 502
+
+
+@catalog.route("/search", methods=['GET'])
+def search():
+    """Merged movie and TV search, paged with an opaque cursor"""
+    try:
+        body, tier = search_page(request.args.get('q', ''), request.args.get('cursor'))
+        return cached_response(body, tier, 60)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except UpstreamError as e:
+        print(f"Search error: {str(e)}")
+        return jsonify({'error': str(e)}), e.status if e.status < 500 else 502
+
+
+@catalog.route("/local-search", methods=['GET'])
+def local_search():
+    """Full-text search over the local catalog mirror"""
+    query = request.args.get('q', '')
+    page = max(request.args.get('page', 1, type=int), 1)
+    try:
+        return jsonify(search_local(query, page)), 200
+    except DBAPIError as e:
+        # SQLite reports the missing index as OperationalError, Postgres as ProgrammingError
+        db.session.rollback()
+        print(f"Local search error: {str(e)}")
+        return jsonify({'error': 'Local catalog has not been ingested'}), 503
+
+
+@catalog.cli.command('ingest')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--type', 'media_type', type=click.Choice(['movie', 'tv']),
+              help='Media type of the dump when items do not carry media_type.')
+def ingest_command(path, media_type):
+    """Load a TMDb-style JSON dump into the local catalog mirror"""
+    ingested = ingest_dump(path, media_type)
+    click.echo(f"Ingested {ingested} titles from {path}")
+
+
+@catalog.cli.command('refresh-eligibility')
+@click.option('--max-age-hours', default=24, help='Re-check entries older than this.')
+@click.option('--limit', default=500, help='Maximum titles to re-check in one run.')
+def refresh_eligibility_command(max_age_hours, limit):
+    """Re-check stale trailer/logo eligibility entries (run from cron)"""
+    refreshed = refresh_eligibility(timedelta(hours=max_age_hours), limit)
+    click.echo(f"Refreshed eligibility for {refreshed} titles")
+
+
+@catalog.cli.command('refresh-certifications')
+@click.option('--max-age-days', default=7, help='Re-index entries older than this.')
+@click.option('--limit', default=500, help='Maximum titles to index in one run.')
+def refresh_certifications_command(max_age_days, limit):
+    """Index age certifications for new titles and re-check stale ones"""
+    refreshed = refresh_certifications(timedelta(days=max_age_days), limit)
+    click.echo(f"Indexed certifications for {refreshed} titles")
+
+
+@catalog.cli.command('build-rows')
+@click.option('--language', default='en-US', help='Language to build the rows for.')
+def build_rows_command(language):
+    """Materialize the home page rows"""
+    built = build_home_rows(language)
+    click.echo(f"Built {built} of the home rows for {language}")
+
+
+@catalog.route("/<path:tmdb_path>", methods=['GET'])
+def proxy(tmdb_path):
+    """Serve a TMDb path through the shared response cache"""
+    ttl = ttl_for(tmdb_path)
+    if ttl is None:
+        return jsonify({'error': 'Unknown catalog path'}), 404
+
+    try:
+        body, tier = tmdb.get(tmdb_path, request.args.to_dict())
+        return cached_response(body, tier, min(ttl, 300))
+    except UpstreamError as e:
+        print(f"Catalog proxy error: {str(e)}")
+        return jsonify({'error': str(e)}), e.status if e.status < 500 else 502
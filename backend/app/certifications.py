@@ -0,0 +1,149 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import tuple_
+from sqlalchemy.exc import IntegrityError
+from .models import TitleCertification, TitleEligibility
+from .tmdb import tmdb, UpstreamError
+from . import db
+
+DEFAULT_REGIONS = ('US', 'GB')
+# Every indexed title has a row for this region, so titles without any
+# rating are not fetched again on every lookup
+INDEXED_MARKER = ''
+FETCH_WORKERS = 8
+
+
+def ratings_path(media_type, tmdb_id):
+    if media_type == 'movie':
+        return f'movie/{tmdb_id}/release_dates'
+    return f'tv/{tmdb_id}/content_ratings'
+
+
+def extract_certifications(media_type, ratings):
+    """Map each region of a release_dates or content_ratings payload to its certification"""
+    certifications = {}
+    for item in (ratings or {}).get('results', []):
+        region = item.get('iso_3166_1')
+        if not region or region in certifications:
+            continue
+        if media_type == 'movie':
+            certification = next(
+                (release['certification'] for release in item.get('release_dates', [])
+                 if release.get('certification')),
+                ''
+            )
+        else:
+            certification = item.get('rating') or ''
+        if certification:
+            certifications[region] = certification[:20]
+    return certifications
+
+
+def pick_certification(certifications, regions=DEFAULT_REGIONS):
+    """Pick the certification for the first region that has one"""
+    for region in regions:
+        if certifications.get(region):
+            return certifications[region]
+    return ''
+
+
+def lookup_certifications(pairs, regions=DEFAULT_REGIONS):
+    """Return ``{(type, id): certification}`` for the titles already in the index"""
+    if not pairs:
+        return {}
+    rows = db.session.query(
+        TitleCertification.media_type,
+        TitleCertification.tmdb_id,
+        TitleCertification.region,
+        TitleCertification.certification
+    ).filter(
+        tuple_(TitleCertification.media_type, TitleCertification.tmdb_id).in_(pairs),
+        TitleCertification.region.in_((INDEXED_MARKER,) + tuple(regions))
+    ).all()
+
+    by_title = {}
+    for media_type, tmdb_id, region, certification in rows:
+        by_title.setdefault((media_type, tmdb_id), {})[region] = certification
+    return {pair: pick_certification(certifications, regions) for pair, certifications in by_title.items()}
+
+
+def fetch_certifications(pairs):
+    """Fetch ratings for many titles concurrently; titles whose lookup fails are left out"""
+    def fetch(pair):
+        try:
+            return pair, extract_certifications(pair[0], tmdb.get_json(ratings_path(*pair)))
+        except UpstreamError as e:
+            print(f"Certification fetch failed for {pair[0]}:{pair[1]}: {str(e)}")
+            return pair, None
+
+    if not pairs:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(pairs))) as pool:
+        return {pair: certifications for pair, certifications in pool.map(fetch, pairs)
+                if certifications is not None}
+
+
+def store_certifications(results):
+    """Replace the index rows of every title in ``results`` with one delete and one insert"""
+    if not results:
+        return
+    now = datetime.now(tz=timezone.utc)
+    TitleCertification.query.filter(
+        tuple_(TitleCertification.media_type, TitleCertification.tmdb_id).in_(list(results))
+    ).delete(synchronize_session=False)
+
+    rows = []
+    for (media_type, tmdb_id), certifications in results.items():
+        for region, certification in dict(certifications, **{INDEXED_MARKER: ''}).items():
+            rows.append({
+                'media_type': media_type,
+                'tmdb_id': tmdb_id,
+                'region': region,
+                'certification': certification,
+                'checked_at': now
+            })
+    try:
+        db.session.execute(TitleCertification.__table__.insert(), rows)
+        db.session.commit()
+    except IntegrityError:
+        # Another worker indexed the same titles first
+        db.session.rollback()
+
+
+def get_certifications(pairs, regions=DEFAULT_REGIONS):
+    """Answer from the index, fetching ratings only for titles never indexed"""
+    known = lookup_certifications(pairs, regions)
+    missing = [pair for pair in pairs if pair not in known]
+    fetched = fetch_certifications(missing)
+    if fetched:
+        store_certifications(fetched)
+        for pair, certifications in fetched.items():
+            known[pair] = pick_certification(certifications, regions)
+    return known
+
+
+def refresh_certifications(max_age=timedelta(days=7), limit=500):
+    """Re-index the oldest entries and titles known to the eligibility index but not yet rated"""
+    cutoff = datetime.now(tz=timezone.utc) - max_age
+    stale = db.session.query(TitleCertification.media_type, TitleCertification.tmdb_id).filter(
+        TitleCertification.region == INDEXED_MARKER,
+        TitleCertification.checked_at < cutoff
+    ).order_by(TitleCertification.checked_at).limit(limit).all()
+    pairs = [(media_type, tmdb_id) for media_type, tmdb_id in stale]
+
+    if len(pairs) < limit:
+        indexed = db.session.query(TitleCertification.media_type, TitleCertification.tmdb_id).filter(
+            TitleCertification.region == INDEXED_MARKER
+        )
+        unindexed = db.session.query(TitleEligibility.media_type, TitleEligibility.tmdb_id).filter(
+            tuple_(TitleEligibility.media_type, TitleEligibility.tmdb_id).notin_(indexed)
+        ).limit(limit - len(pairs)).all()
+        pairs.extend((media_type, tmdb_id) for media_type, tmdb_id in unindexed)
+
+    # Drop cached upstream responses so the refresh sees current ratings
+    for media_type, tmdb_id in pairs:
+        tmdb.invalidate(ratings_path(media_type, tmdb_id))
+
+    fetched = fetch_certifications(pairs)
+    store_certifications(fetched)
+    return len(fetched)
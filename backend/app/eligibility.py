@@ -0,0 +1,114 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import tuple_
+from .models import TitleEligibility
+from .tmdb import tmdb, UpstreamError
+from .versions import dialect_insert
+from . import db
+
+MEDIA_TYPES = ('movie', 'tv')
+MAX_BATCH_SIZE = 100
+CHECK_WORKERS = 8
+
+
+def parse_titles(items):
+    """Turn ``[{'type': 'movie', 'id': 1}, ...]`` into unique ``(type, id)`` pairs"""
+    pairs = []
+    seen = set()
+    for item in items or []:
+        media_type = item.get('type')
+        try:
+            tmdb_id = int(item.get('id'))
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid title id: {item.get('id')}")
+        if media_type not in MEDIA_TYPES:
+            raise ValueError(f"Invalid title type: {media_type}")
+        if (media_type, tmdb_id) not in seen:
+            seen.add((media_type, tmdb_id))
+            pairs.append((media_type, tmdb_id))
+    return pairs
+
+
+def check_title(media_type, tmdb_id):
+    """Ask upstream whether a title has videos and a logo"""
+    videos = tmdb.get_json(f'{media_type}/{tmdb_id}/videos')
+    images = tmdb.get_json(f'{media_type}/{tmdb_id}/images')
+    return {
+        'has_trailer': bool(videos.get('results')),
+        'has_logo': bool(images.get('logos'))
+    }
+
+
+def check_titles(pairs):
+    """Check many titles concurrently; titles whose lookup fails are left out"""
+    def check(pair):
+        try:
+            return pair, check_title(*pair)
+        except UpstreamError as e:
+            print(f"Eligibility check failed for {pair[0]}:{pair[1]}: {str(e)}")
+            return pair, None
+
+    if not pairs:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(CHECK_WORKERS, len(pairs))) as pool:
+        return {pair: flags for pair, flags in pool.map(check, pairs) if flags is not None}
+
+
+def store_results(results):
+    """Upsert index rows in one statement, so workers checking the same titles don't collide"""
+    if not results:
+        return
+    now = datetime.now(tz=timezone.utc)
+    statement = dialect_insert(TitleEligibility).values([{
+        'media_type': media_type,
+        'tmdb_id': tmdb_id,
+        'has_trailer': flags['has_trailer'],
+        'has_logo': flags['has_logo'],
+        'checked_at': now
+    } for (media_type, tmdb_id), flags in results.items()])
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=[TitleEligibility.media_type, TitleEligibility.tmdb_id],
+        set_={
+            'has_trailer': statement.excluded.has_trailer,
+            'has_logo': statement.excluded.has_logo,
+            'checked_at': statement.excluded.checked_at
+        }
+    ))
+    db.session.commit()
+
+
+def get_eligibility(pairs):
+    """Answer from the index, checking upstream only for titles never seen before"""
+    known = {}
+    if pairs:
+        rows = TitleEligibility.query.filter(
+            tuple_(TitleEligibility.media_type, TitleEligibility.tmdb_id).in_(pairs)
+        ).all()
+        known = {(row.media_type, row.tmdb_id): row.to_dict() for row in rows}
+
+    missing = [pair for pair in pairs if pair not in known]
+    checked = check_titles(missing)
+    if checked:
+        store_results(checked)
+        for (media_type, tmdb_id), flags in checked.items():
+            known[(media_type, tmdb_id)] = {'type': media_type, 'id': tmdb_id, **flags}
+
+    return [known[pair] for pair in pairs if pair in known]
+
+
+def refresh_eligibility(max_age=timedelta(days=1), limit=500):
+    """Re-check the oldest index entries; run on a schedule"""
+    cutoff = datetime.now(tz=timezone.utc) - max_age
+    rows = TitleEligibility.query.filter(
+        TitleEligibility.checked_at < cutoff
+    ).order_by(TitleEligibility.checked_at).limit(limit).all()
+
+    pairs = [(row.media_type, row.tmdb_id) for row in rows]
+    # Drop cached upstream responses so the re-check sees current data
+    for media_type, tmdb_id in pairs:
+        tmdb.invalidate(f'{media_type}/{tmdb_id}/videos')
+        tmdb.invalidate(f'{media_type}/{tmdb_id}/images')
+
+    checked = check_titles(pairs)
+    store_results(checked)
+    return len(checked)
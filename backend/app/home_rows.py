@@ -0,0 +1,130 @@
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from .models import HomeRow
+from .eligibility import get_eligibility
+from .certifications import get_certifications
+from .tmdb import tmdb, UpstreamError
+from .versions import dialect_insert
+from . import db
+
+# Mirrors the rows rendered by HomeScreen
+HOME_ROWS = [
+    {'key': 'originals', 'title': 'SHARK STREAMER ORIGINALS', 'path': 'discover/tv',
+     'params': {'with_networks': 213}, 'media_type': 'tv', 'is_large_row': True},
+    {'key': 'trending', 'title': 'Trending Now', 'path': 'trending/all/week', 'params': {}},
+    {'key': 'top_rated', 'title': 'Top Rated', 'path': 'movie/top_rated', 'params': {}, 'media_type': 'movie'},
+    {'key': 'action', 'title': 'Action Movies', 'path': 'discover/movie',
+     'params': {'with_genres': 28}, 'media_type': 'movie'},
+    {'key': 'comedy', 'title': 'Comedy Movies', 'path': 'discover/movie',
+     'params': {'with_genres': 35}, 'media_type': 'movie'},
+    {'key': 'horror', 'title': 'Horror Movies', 'path': 'discover/movie',
+     'params': {'with_genres': 27}, 'media_type': 'movie'},
+    {'key': 'romance', 'title': 'Romance Movies', 'path': 'discover/movie',
+     'params': {'with_genres': 10749}, 'media_type': 'movie'},
+    {'key': 'documentaries', 'title': 'Documentaries', 'path': 'discover/movie',
+     'params': {'with_genres': 99}, 'media_type': 'movie'},
+]
+
+MAX_CANDIDATES = 20
+RELOAD_INTERVAL = 60
+
+
+def build_row(row, language):
+    """Fetch a row upstream and keep titles that have artwork, a trailer and a logo"""
+    params = dict(row['params'], language=language)
+    results = tmdb.get_json(row['path'], params).get('results') or []
+
+    image_field = 'poster_path' if row.get('is_large_row') else 'backdrop_path'
+    candidates = []
+    for item in results:
+        media_type = item.get('media_type') or row.get('media_type')
+        if media_type in ('movie', 'tv') and item.get(image_field) and item.get('id'):
+            candidates.append(dict(item, media_type=media_type))
+    candidates = candidates[:MAX_CANDIDATES]
+
+    eligible = {
+        (entry['type'], entry['id'])
+        for entry in get_eligibility([(item['media_type'], item['id']) for item in candidates])
+        if entry['has_trailer'] and entry['has_logo']
+    }
+    results = [item for item in candidates if (item['media_type'], item['id']) in eligible]
+    certifications = get_certifications([(item['media_type'], item['id']) for item in results])
+    return {
+        'key': row['key'],
+        'title': row['title'],
+        'isLargeRow': bool(row.get('is_large_row')),
+        'results': [
+            dict(item, certification=certifications.get((item['media_type'], item['id']), ''))
+            for item in results
+        ],
+    }
+
+
+def build_home_rows(language='en-US'):
+    """Materialize every home row for a language; rows that fail keep their last build"""
+    built = 0
+    for position, row in enumerate(HOME_ROWS):
+        try:
+            payload = json.dumps(build_row(row, language))
+        except UpstreamError as e:
+            print(f"Home row {row['key']} build failed: {str(e)}")
+            continue
+        # An upsert, since a CLI build may race a worker's scheduled one
+        statement = dialect_insert(HomeRow).values(
+            row_key=row['key'],
+            language=language,
+            position=position,
+            payload=payload,
+            built_at=datetime.now(tz=timezone.utc)
+        )
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=[HomeRow.row_key, HomeRow.language],
+            set_={
+                'position': statement.excluded.position,
+                'payload': statement.excluded.payload,
+                'built_at': statement.excluded.built_at
+            }
+        ))
+        built += 1
+    db.session.commit()
+    return built
+
+
+class HomeRowStore:
+    """Per-worker copy of the combined home rows response, reloaded from the DB"""
+
+    def __init__(self):
+        self._documents = {}
+        self._lock = threading.Lock()
+
+    def load(self, language):
+        rows = HomeRow.query.filter_by(language=language).order_by(HomeRow.position).all()
+        if not rows:
+            return None
+        built_at = max(row.built_at for row in rows if row.built_at)
+        # Row payloads are already JSON, so the response is stitched together
+        # rather than decoded and re-encoded
+        return (
+            b'{"language":' + json.dumps(language).encode()
+            + b',"builtAt":' + json.dumps(built_at.isoformat()).encode()
+            + b',"rows":[' + b','.join(row.payload.encode() for row in rows) + b']}'
+        )
+
+    def get(self, language):
+        now = time.monotonic()
+        with self._lock:
+            document = self._documents.get(language)
+        if document is not None and now - document[1] < RELOAD_INTERVAL:
+            return document[0]
+
+        body = self.load(language)
+        if body is None:
+            return document[0] if document else None
+        with self._lock:
+            self._documents[language] = (body, now)
+        return body
+
+
+home_rows = HomeRowStore()
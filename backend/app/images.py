@@ -0,0 +1,179 @@
+import hashlib
+import multiprocessing
+import os
+import re
+import tempfile
+import http.client
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from flask import Blueprint, jsonify, request, send_file
+from PIL import Image
+from .singleflight import SingleFlight
+from .tmdb import UpstreamError
+from .upstream import upstream
+
+images = Blueprint('images', __name__)
+
+# TMDb size names the frontend uses, mapped to target widths
+SIZES = {
+    'w92': 92, 'w154': 154, 'w185': 185, 'w300': 300, 'w342': 342,
+    'w500': 500, 'w780': 780, 'w1280': 1280, 'original': None,
+}
+FORMATS = {'webp': 'image/webp', 'jpeg': 'image/jpeg', 'png': 'image/png'}
+# No SVG: it can carry script and would run on the API's origin
+FILE_PATTERN = re.compile(r'^[A-Za-z0-9_\-]+\.(jpg|jpeg|png)$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'wb') as tmp:
+        tmp.write(data)
+    os.replace(tmp_path, path)
+
+
+def render_variant(original_path, variant_path, width, fmt):
+    """Resize and re-encode one image; runs in the process pool"""
+    with Image.open(original_path) as image:
+        if width and image.width > width:
+            height = round(image.height * width / image.width)
+            image = image.resize((width, height), Image.Resampling.LANCZOS)
+        has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+        if fmt == 'jpeg':
+            image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        options = {'webp': {'quality': 80, 'method': 4}, 'jpeg': {'quality': 85, 'optimize': True,
+                   'progressive': True}, 'png': {'optimize': True}}[fmt]
+        os.makedirs(os.path.dirname(variant_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(variant_path))
+        with os.fdopen(fd, 'wb') as tmp:
+            image.save(tmp, format=fmt.upper(), **options)
+        os.replace(tmp_path, variant_path)
+    return variant_path
+
+
+class ImageStore:
+    """Content-addressed originals and resized variants on local disk"""
+
+    def __init__(self):
+        self.root = None
+        self.base_url = None
+        self.timeout = 10
+        self.variant_timeout = 10
+        self.workers = 2
+        self.flights = SingleFlight()
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.root = app.config['IMAGE_CACHE_DIR']
+        self.base_url = app.config['TMDB_IMAGE_BASE_URL'].rstrip('/')
+        self.timeout = app.config['TMDB_TIMEOUT']
+        self.variant_timeout = app.config['IMAGE_VARIANT_TIMEOUT']
+        self.workers = app.config['IMAGE_WORKERS']
+        app.extensions['image_store'] = self
+
+    @property
+    def pool(self):
+        # Created per worker process; spawned children don't inherit the
+        # parent's threads or locks
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+                self._pid = os.getpid()
+            return self._pool
+
+    def _ref_path(self, file_name):
+        return os.path.join(self.root, 'refs', hashlib.sha1(file_name.encode()).hexdigest())
+
+    def original(self, file_name):
+        """Return ``(digest, path)`` of the upstream original, downloading it once"""
+        ref_path = self._ref_path(file_name)
+        try:
+            with open(ref_path) as ref:
+                digest = ref.read().strip()
+            path = self.original_path(digest, file_name)
+            if os.path.exists(path):
+                return digest, path
+        except FileNotFoundError:
+            pass
+        return self.flights.do(file_name, lambda: self._download(file_name))
+
+    def original_path(self, digest, file_name):
+        extension = file_name.rsplit('.', 1)[-1]
+        return os.path.join(self.root, 'originals', digest[:2], f'{digest}.{extension}')
+
+    def _download(self, file_name):
+        url = f'{self.base_url}/original/{file_name}'
+        status, data = upstream.request(url, timeout=self.timeout)
+        if status != 200:
+            raise UpstreamError(f"Upstream returned {status} for {file_name}", status=status)
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.original_path(digest, file_name)
+        if not os.path.exists(path):
+            write_atomic(path, data)
+        write_atomic(self._ref_path(file_name), digest.encode())
+        return digest, path
+
+    def variant(self, digest, original_path, size, fmt):
+        """Return the path of a variant, rendering it in the process pool if needed"""
+        path = os.path.join(self.root, 'variants', digest[:2], digest, f'{size}.{fmt}')
+        if os.path.exists(path):
+            return path
+        key = f'{digest}/{size}.{fmt}'
+        return self.flights.do(key, lambda: self.pool.submit(
+            render_variant, original_path, path, SIZES[size], fmt
+        ).result(timeout=self.variant_timeout))
+
+
+image_store = ImageStore()
+
+
+def negotiate_format(file_name):
+    requested = request.args.get('format')
+    if requested:
+        return requested if requested in FORMATS else None
+    if 'image/webp' in request.headers.get('Accept', ''):
+        return 'webp'
+    return 'png' if file_name.endswith('.png') else 'jpeg'
+
+
+@images.route("/<string:size>/<string:file_name>", methods=['GET'])
+def get_image(size, file_name):
+    """Serve a resized, re-encoded copy of a TMDb image"""
+    if size not in SIZES or not FILE_PATTERN.match(file_name):
+        return jsonify({'error': 'Image not found'}), 404
+
+    fmt = negotiate_format(file_name)
+    if fmt is None:
+        return jsonify({'error': 'Unsupported image format'}), 400
+
+    try:
+        digest, original_path = image_store.original(file_name)
+    except UpstreamError as e:
+        return jsonify({'error': 'Image not found'}), 404 if e.status == 404 else 502
+    except (OSError, http.client.HTTPException) as e:
+        print(f"Image download error: {str(e)}")
+        return jsonify({'error': 'Image upstream unavailable'}), 502
+
+    try:
+        path = image_store.variant(digest, original_path, size, fmt)
+    except FutureTimeoutError:
+        # Serve the original for now; the variant finishes in the background
+        response = send_file(original_path, conditional=True)
+        response.headers['Cache-Control'] = 'public, max-age=60'
+        return response
+    except Exception as e:
+        print(f"Image variant error: {str(e)}")
+        return jsonify({'error': 'Invalid image'}), 502
+
+    response = send_file(path, mimetype=FORMATS[fmt], etag=f'{digest[:24]}-{size}-{fmt}', conditional=True)
+    response.headers['Cache-Control'] = IMMUTABLE
+    if not request.args.get('format'):
+        response.headers['Vary'] = 'Accept'
+    return response
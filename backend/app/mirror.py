@@ -0,0 +1,161 @@
+import json
+import math
+import re
+from sqlalchemy import text
+from .models import CatalogTitle
+from .search import is_valid_item, PAGE_SIZE
+from . import db
+
+FTS_TABLE = 'catalog_title_fts'
+# Column weights for title, original title and overview
+BM25_WEIGHTS = (10.0, 5.0, 1.0)
+POPULARITY_WEIGHT = 0.5
+RERANK_WINDOW = 200
+INGEST_BATCH_SIZE = 500
+
+
+def is_sqlite():
+    return db.engine.dialect.name == 'sqlite'
+
+
+def ensure_search_index():
+    """Create the FTS5 index over catalog_title (SQLite only)"""
+    if not is_sqlite():
+        return False
+    db.session.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "title, original_title, overview, "
+        "content='catalog_title', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    ))
+    db.session.commit()
+    return True
+
+
+def rebuild_search_index():
+    if ensure_search_index():
+        db.session.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('rebuild')"))
+        db.session.commit()
+
+
+def read_dump(path):
+    """Yield items from a JSON array, a TMDb response with ``results`` or JSON lines"""
+    with open(path, encoding='utf-8') as dump:
+        first = dump.read(1)
+        while first and first.isspace():
+            first = dump.read(1)
+        dump.seek(0)
+        if first in ('[', '{'):
+            try:
+                data = json.load(dump)
+            except json.JSONDecodeError:
+                data = None
+            if isinstance(data, list):
+                yield from data
+                return
+            if isinstance(data, dict):
+                yield from data.get('results', [data])
+                return
+            dump.seek(0)
+        for line in dump:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def item_media_type(item, default=None):
+    if item.get('media_type') in ('movie', 'tv'):
+        return item['media_type']
+    if default:
+        return default
+    return 'tv' if item.get('name') and not item.get('title') else 'movie'
+
+
+def ingest_dump(path, media_type=None):
+    """Upsert every item of a dump into catalog_title and rebuild the search index"""
+    existing = {
+        (row.media_type, row.tmdb_id): row.id
+        for row in db.session.query(CatalogTitle.id, CatalogTitle.media_type, CatalogTitle.tmdb_id)
+    }
+    # Titles merged since the last commit, whose ids are not known until it
+    # runs; a key seen again in the same batch updates that instance
+    batch = {}
+    ingested = 0
+    for item in read_dump(path):
+        title = item.get('title') or item.get('name') or item.get('original_title') or item.get('original_name')
+        if not item.get('id') or not title:
+            continue
+        item_type = item_media_type(item, media_type)
+        key = (item_type, int(item['id']))
+        fields = dict(
+            media_type=item_type,
+            tmdb_id=key[1],
+            title=title,
+            original_title=item.get('original_title') or item.get('original_name'),
+            overview=item.get('overview'),
+            popularity=item.get('popularity') or 0.0,
+            data=dict(item, media_type=item_type)
+        )
+        if key in batch:
+            for name, value in fields.items():
+                setattr(batch[key], name, value)
+        else:
+            batch[key] = db.session.merge(CatalogTitle(id=existing.get(key), **fields))
+        ingested += 1
+        if ingested % INGEST_BATCH_SIZE == 0:
+            db.session.commit()
+            existing.update((key, row.id) for key, row in batch.items())
+            batch = {}
+    db.session.commit()
+    rebuild_search_index()
+    return ingested
+
+
+def fts_query(query):
+    """Quote each word so user input can't inject FTS syntax.
+
+    The last word is matched as a prefix for search-as-you-type, unless it
+    is a single character, which would match nearly every title.
+    """
+    words = re.findall(r'\w+', query.lower())
+    terms = [f'"{word}"' for word in words]
+    if words and len(words[-1]) > 1:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def search_local(query, page=1):
+    """Search the mirror, ranking by BM25 blended with log popularity"""
+    match = fts_query(query)
+    if not match:
+        return {'results': [], 'hasNextPage': False, 'page': page}
+
+    if is_sqlite():
+        weights = ', '.join(str(weight) for weight in BM25_WEIGHTS)
+        # Rank inside the index first so only the top window is joined
+        rows = db.session.execute(text(
+            f"SELECT c.data, ranked.rank, c.popularity FROM ("
+            f"SELECT rowid, bm25({FTS_TABLE}, {weights}) AS rank FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH :match ORDER BY rank LIMIT :limit"
+            f") AS ranked JOIN catalog_title c ON c.id = ranked.rowid"
+        ), {'match': match, 'limit': RERANK_WINDOW}).fetchall()
+        # bm25() is lower-is-better, so popularity is subtracted
+        scored = [
+            (rank - POPULARITY_WEIGHT * math.log1p(popularity or 0), json.loads(data))
+            for data, rank, popularity in rows
+        ]
+    else:
+        pattern = f"%{query.strip()}%"
+        rows = CatalogTitle.query.filter(db.or_(
+            CatalogTitle.title.ilike(pattern), CatalogTitle.original_title.ilike(pattern)
+        )).order_by(CatalogTitle.popularity.desc()).limit(RERANK_WINDOW).all()
+        scored = [(-(row.popularity or 0), row.data) for row in rows]
+
+    scored.sort(key=lambda entry: entry[0])
+    items = [item for _, item in scored if is_valid_item(item)]
+    start = (page - 1) * PAGE_SIZE
+    return {
+        'results': items[start:start + PAGE_SIZE],
+        'hasNextPage': len(items) > start + PAGE_SIZE,
+        'page': page,
+    }
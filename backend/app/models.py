@@ -28,7 +28,7 @@ class User(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password = db.Column(db.String(100), nullable=False)
+    password = db.Column(db.String(255), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.now(tz=timezone.utc))
     subscription_plan = db.Column(db.String(20), default='basic')
     
@@ -72,6 +72,9 @@ class Profile(db.Model):
 
 class WatchlistItem(db.Model):
     __tablename__ = "watchlist_item"
+    __table_args__ = (
+        db.Index('uq_watchlist_item_profile_id_movie_id', 'profile_id', 'movie_id', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     profile_id = db.Column(db.Integer, db.ForeignKey('profile.id'), nullable=False)
@@ -115,4 +118,83 @@ class ViewingHistory(db.Model):
     progress_percent = db.Column(db.Float, default=0.0)
     
     def __repr__(self):
-        return f"<ViewingHistory {self.movie_title}>"
\ No newline at end of file
+        return f"<ViewingHistory {self.movie_title}>"
+class ResourceVersion(db.Model):
+    __tablename__ = "resource_version"
+
+    key = db.Column(db.String(64), primary_key=True)  # e.g. 'watchlist:12'
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ResourceVersion {self.key} {self.version}>"
+
+class RevokedToken(db.Model):
+    __tablename__ = "revoked_token"
+
+    id = db.Column(db.Integer, primary_key=True)  # Workers load new rows past the last id they saw
+    jti = db.Column(db.String(32), unique=True, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, default=lambda: datetime.now(tz=timezone.utc))
+
+    def __repr__(self):
+        return f"<RevokedToken {self.jti}>"
+
+class TitleEligibility(db.Model):
+    __tablename__ = "title_eligibility"
+
+    media_type = db.Column(db.String(10), primary_key=True)
+    tmdb_id = db.Column(db.Integer, primary_key=True)
+    has_trailer = db.Column(db.Boolean, nullable=False, default=False)
+    has_logo = db.Column(db.Boolean, nullable=False, default=False)
+    checked_at = db.Column(db.DateTime, default=lambda: datetime.now(tz=timezone.utc), index=True)
+
+    def to_dict(self):
+        return {
+            'type': self.media_type,
+            'id': self.tmdb_id,
+            'has_trailer': self.has_trailer,
+            'has_logo': self.has_logo
+        }
+
+    def __repr__(self):
+        return f"<TitleEligibility {self.media_type}:{self.tmdb_id}>"
+
+class TitleCertification(db.Model):
+    __tablename__ = "title_certification"
+
+    media_type = db.Column(db.String(10), primary_key=True)
+    tmdb_id = db.Column(db.Integer, primary_key=True)
+    region = db.Column(db.String(2), primary_key=True)  # '' marks a title checked with no ratings
+    certification = db.Column(db.String(20), nullable=False, default='')
+    checked_at = db.Column(db.DateTime, default=lambda: datetime.now(tz=timezone.utc), index=True)
+
+    def __repr__(self):
+        return f"<TitleCertification {self.media_type}:{self.tmdb_id} {self.region}>"
+
+class HomeRow(db.Model):
+    __tablename__ = "home_row"
+
+    row_key = db.Column(db.String(50), primary_key=True)
+    language = db.Column(db.String(10), primary_key=True)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    payload = db.Column(db.Text, nullable=False)  # Pre-serialized JSON for the row
+    built_at = db.Column(db.DateTime, default=lambda: datetime.now(tz=timezone.utc))
+
+    def __repr__(self):
+        return f"<HomeRow {self.row_key} {self.language}>"
+
+class CatalogTitle(db.Model):
+    __tablename__ = "catalog_title"
+    __table_args__ = (db.UniqueConstraint('media_type', 'tmdb_id', name='uq_catalog_title_media_type_tmdb_id'),)
+
+    id = db.Column(db.Integer, primary_key=True)  # Also the rowid of the FTS index
+    media_type = db.Column(db.String(10), nullable=False)
+    tmdb_id = db.Column(db.Integer, nullable=False)
+    title = db.Column(db.String(300), nullable=False)
+    original_title = db.Column(db.String(300))
+    overview = db.Column(db.Text)
+    popularity = db.Column(db.Float, default=0.0)
+    data = db.Column(JSONEncodedDict)  # The TMDb item as ingested
+
+    def __repr__(self):
+        return f"<CatalogTitle {self.media_type}:{self.tmdb_id} {self.title}>"
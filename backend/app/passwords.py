@@ -0,0 +1,126 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+# Werkzeug's defaults, so a policy like 'pbkdf2:sha256' compares equal to
+# the 'pbkdf2:sha256:600000' it writes into stored hashes
+SCRYPT_DEFAULTS = ('32768', '8', '1')
+
+
+class HasherBusy(Exception):
+    pass
+
+
+def normalize_method(method):
+    parts = method.split(':')
+    if parts[0] == 'pbkdf2':
+        parts += ['sha256', str(DEFAULT_PBKDF2_ITERATIONS)][len(parts) - 1:]
+    elif parts[0] == 'scrypt':
+        parts += list(SCRYPT_DEFAULTS[len(parts) - 1:])
+    return ':'.join(parts)
+
+
+def stored_method(password_hash):
+    return password_hash.split('$', 1)[0]
+
+
+class PasswordHasher:
+    """Hashes and checks passwords in a process pool so request threads stay free.
+
+    At most ``max_pending`` hashes may be queued or running per worker;
+    beyond that ``HasherBusy`` is raised so callers can shed load instead
+    of queueing. A hash that takes longer than ``timeout`` also raises
+    ``HasherBusy``; it keeps its slot until it actually finishes. With
+    ``workers`` set to 0 hashing runs inline.
+    """
+
+    def __init__(self):
+        self.method = normalize_method('pbkdf2:sha256')
+        self.workers = 2
+        self.max_pending = 16
+        self.timeout = 10
+        self._pending = 0
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._counters = {'hashed': 0, 'checked': 0, 'rehashed': 0, 'rejected_busy': 0, 'timed_out': 0}
+
+    def init_app(self, app):
+        self.method = normalize_method(app.config['PASSWORD_HASH_METHOD'])
+        self.workers = app.config['PASSWORD_HASH_WORKERS']
+        self.max_pending = app.config['PASSWORD_HASH_MAX_PENDING']
+        app.extensions['password_hasher'] = self
+
+    @property
+    def pool(self):
+        # Per worker process, as for image variants
+        if self._pid != os.getpid():
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+            self._pid = os.getpid()
+        return self._pool
+
+    def _run(self, func, *args):
+        if not self.workers:
+            return func(*args)
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._counters['rejected_busy'] += 1
+                raise HasherBusy('Too many password operations in progress')
+            self._pending += 1
+            pool = self.pool
+        try:
+            future = pool.submit(func, *args)
+        except Exception:
+            self._release(None)
+            raise
+        # The slot is held until the job ends, even if this request stops waiting
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self._counters['timed_out'] += 1
+            raise HasherBusy('Password operation timed out')
+
+    def _release(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def hash(self, password):
+        password_hash = self._run(generate_password_hash, password, self.method)
+        with self._lock:
+            self._counters['hashed'] += 1
+        return password_hash
+
+    def needs_rehash(self, password_hash):
+        return stored_method(password_hash) != self.method
+
+    def verify(self, password_hash, password):
+        """Check a password; returns ``(valid, new_hash)``.
+
+        ``new_hash`` is set when the stored hash was made under an older
+        policy and has been re-hashed; the caller saves it. The re-hash is
+        skipped, and retried on a later login, while the pool is busy.
+        """
+        valid = self._run(check_password_hash, password_hash, password)
+        with self._lock:
+            self._counters['checked'] += 1
+        if not valid or not self.needs_rehash(password_hash):
+            return valid, None
+        try:
+            new_hash = self.hash(password)
+        except HasherBusy:
+            return True, None
+        with self._lock:
+            self._counters['rehashed'] += 1
+        return True, new_hash
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, pending=self._pending, method=self.method)
+
+
+hasher = PasswordHasher()
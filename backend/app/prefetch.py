@@ -0,0 +1,123 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from .tmdb import tmdb
+from .titles import get_title_document, title_key
+
+
+class SimilarPrefetcher:
+    """Warms title documents for the top similar titles of a title just served.
+
+    Prefetches run on a small pool of their own and are skipped rather than
+    queued once ``max_pending`` are waiting, when the per-worker budget of
+    ``rate`` prefetches per second is spent, or while the upstream circuit
+    is open, so live requests always come first.
+    """
+
+    def __init__(self, top_n=0, workers=2, rate=2.0, max_pending=16, max_tracked=2048):
+        self.top_n = top_n
+        self.workers = workers
+        self.rate = rate
+        self.max_pending = max_pending
+        self.max_tracked = max_tracked
+        self._tokens = rate
+        self._updated = time.monotonic()
+        self._pending = 0
+        self._prefetched = OrderedDict()  # title key -> prefetched at
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+        self._counters = {'scheduled': 0, 'prefetched': 0, 'already_cached': 0, 'hits': 0,
+                          'skipped_budget': 0, 'skipped_busy': 0, 'failed': 0}
+
+    def init_app(self, app):
+        self.top_n = app.config['PREFETCH_SIMILAR']
+        self.workers = app.config['PREFETCH_WORKERS']
+        self.rate = app.config['PREFETCH_RATE']
+        self._tokens = self.rate
+
+    @property
+    def pool(self):
+        if self._pid != os.getpid():
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='title-prefetch')
+            self._pid = os.getpid()
+        return self._pool
+
+    def record_request(self, media_type, tmdb_id, language):
+        """Count a title request that a prefetch got to first"""
+        with self._lock:
+            if self._prefetched.pop(title_key(media_type, tmdb_id, language), None) is not None:
+                self._counters['hits'] += 1
+
+    def _take_budget(self):
+        now = time.monotonic()
+        self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def schedule(self, app, body, language):
+        """Queue prefetches for the similar titles in a served title document"""
+        if not self.top_n or tmdb.breaker.is_open:
+            return
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._counters['skipped_busy'] += 1
+                return
+            self._pending += 1
+            self._counters['scheduled'] += 1
+            pool = self.pool
+        pool.submit(self._run, app, body, language)
+
+    def _run(self, app, body, language):
+        try:
+            document = json.loads(body)
+            media_type = document['type']
+            for item in document.get('similar', [])[:self.top_n]:
+                # Similar titles are always the same media type as the title
+                self._prefetch(app, item.get('media_type') or media_type, item['id'], language)
+        except Exception as e:
+            print(f"Similar prefetch failed: {str(e)}")
+            with self._lock:
+                self._counters['failed'] += 1
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _prefetch(self, app, media_type, tmdb_id, language):
+        key = title_key(media_type, tmdb_id, language)
+        if tmdb.cache.peek(key):
+            with self._lock:
+                self._counters['already_cached'] += 1
+            return
+        with self._lock:
+            if not self._take_budget():
+                self._counters['skipped_budget'] += 1
+                return
+        with app.app_context():
+            get_title_document(media_type, tmdb_id, language)
+        with self._lock:
+            self._counters['prefetched'] += 1
+            self._prefetched[key] = time.time()
+            while len(self._prefetched) > self.max_tracked:
+                self._prefetched.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            pending = self._pending
+        prefetched = counters['prefetched']
+        return dict(
+            counters,
+            pending=pending,
+            top_n=self.top_n,
+            hit_ratio=round(counters['hits'] / prefetched, 4) if prefetched else 0.0,
+        )
+
+
+prefetcher = SimilarPrefetcher()
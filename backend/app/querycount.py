@@ -0,0 +1,64 @@
+from functools import wraps
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryCounter:
+    """Counts SQL statements per request in debug mode (or with QUERY_COUNTER=1).
+
+    The total goes out in an ``X-Query-Count`` header. Views decorated
+    with ``query_budget(n)`` also check the statements they issue
+    themselves, token checks excluded, and report overruns in an
+    ``X-Query-Budget-Exceeded`` header and the log.
+    """
+
+    def __init__(self):
+        self._listening = False
+
+    def init_app(self, app):
+        if not self._listening:
+            event.listen(Engine, 'before_cursor_execute', self._count)
+            self._listening = True
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    def enabled(self):
+        return current_app.debug or current_app.config['QUERY_COUNTER']
+
+    def _count(self, *args):
+        if has_request_context() and 'query_count' in g:
+            g.query_count += 1
+
+    def _start(self):
+        if self.enabled():
+            g.query_count = 0
+
+    def _finish(self, response):
+        if 'query_count' in g:
+            response.headers['X-Query-Count'] = str(g.query_count)
+            if 'query_budget_exceeded' in g:
+                response.headers['X-Query-Budget-Exceeded'] = g.query_budget_exceeded
+        return response
+
+
+query_counter = QueryCounter()
+
+
+def query_budget(limit):
+    """Declare how many statements a view may issue; place it just below ``require_auth``"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if 'query_count' not in g:
+                return view(*args, **kwargs)
+            before = g.query_count
+            result = view(*args, **kwargs)
+            used = g.query_count - before
+            if used > limit:
+                g.query_budget_exceeded = f'{used}/{limit}'
+                print(f"Query budget exceeded for {request.endpoint}: {used} > {limit}")
+            return result
+        wrapper.query_budget = limit
+        return wrapper
+    return decorator
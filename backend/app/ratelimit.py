@@ -0,0 +1,118 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+class SharedTokenBucket:
+    """Token bucket kept in SQLite so every worker on the host draws from one budget.
+
+    ``rate`` tokens are added per second up to ``burst``. A rate of 0
+    disables the limiter.
+    """
+
+    def __init__(self, path, name='upstream', rate=0, burst=None):
+        self.path = path
+        self.name = name
+        self.rate = rate
+        self.burst = burst or rate
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._counters = {'allowed': 0, 'delayed': 0, 'throttled': 0, 'penalties': 0}
+        self._wait_time = 0.0
+        if rate:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connect().execute(
+                'CREATE TABLE IF NOT EXISTS token_bucket ('
+                'name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)'
+            )
+
+    def _connect(self):
+        # Per thread and per process, as in SQLiteCache
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _take(self, tokens_delta=-1, force=False):
+        """Refill, then apply ``tokens_delta`` if the bucket allows it.
+
+        Returns how many seconds until a token is available (0 if taken).
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT tokens, updated_at FROM token_bucket WHERE name = ?', (self.name,)
+            ).fetchone()
+            tokens = self.burst if row is None else min(self.burst, row[0] + (now - row[1]) * self.rate)
+            wait = 0.0
+            if force or tokens >= 1:
+                tokens += tokens_delta
+            else:
+                wait = (1 - tokens) / self.rate
+            conn.execute(
+                'INSERT OR REPLACE INTO token_bucket (name, tokens, updated_at) VALUES (?, ?, ?)',
+                (self.name, tokens, now)
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+    def acquire(self, max_wait):
+        """Take one token, sleeping up to ``max_wait`` seconds for it; False if throttled"""
+        if not self.rate:
+            return True
+        started = time.monotonic()
+        while True:
+            try:
+                wait = self._take()
+            except sqlite3.Error as e:
+                # Never block upstream calls on a broken limiter file
+                print(f"Rate limiter error: {str(e)}")
+                return True
+            waited = time.monotonic() - started
+            if wait == 0:
+                with self._lock:
+                    self._counters['allowed'] += 1
+                    self._counters['delayed'] += waited > 0.001
+                    self._wait_time += waited
+                return True
+            if waited + wait > max_wait:
+                with self._lock:
+                    self._counters['throttled'] += 1
+                    self._wait_time += waited
+                return False
+            time.sleep(wait)
+
+    def penalize(self, seconds):
+        """Drain the bucket so every worker backs off, e.g. after upstream answers 429"""
+        if not self.rate:
+            return
+        try:
+            self._take(tokens_delta=-self.rate * seconds, force=True)
+        except sqlite3.Error as e:
+            print(f"Rate limiter error: {str(e)}")
+        with self._lock:
+            self._counters['penalties'] += 1
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            wait_time = self._wait_time
+        calls = counters['allowed'] + counters['throttled']
+        return dict(
+            counters,
+            rate=self.rate,
+            burst=self.burst,
+            wait_ms_avg=round(wait_time / calls * 1000, 2) if calls else None,
+        )
@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class RefreshScheduler:
+    """Refreshes stale cache entries in the background, most-hit keys first.
+
+    At most ``concurrency`` refreshes run at once and at most
+    ``max_pending`` wait; when the queue is full the coldest key is dropped.
+    Hit counts are halved every ``decay_interval`` seconds so priority
+    follows recent traffic.
+    """
+
+    def __init__(self, concurrency=4, max_pending=1000, decay_interval=300, max_tracked=10000):
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.decay_interval = decay_interval
+        self.max_tracked = max_tracked
+        self._hits = {}
+        self._pending = {}
+        self._running = set()
+        self._cond = threading.Condition()
+        self._next_decay = time.monotonic() + decay_interval
+        self._pool = None
+        self._pid = None
+        self._counters = {'scheduled': 0, 'completed': 0, 'failed': 0, 'dropped': 0}
+
+    def configure(self, concurrency, max_pending):
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+
+    def record_hit(self, key):
+        with self._cond:
+            self._hits[key] = self._hits.get(key, 0) + 1
+            if time.monotonic() >= self._next_decay or len(self._hits) > self.max_tracked:
+                self._decay()
+
+    def _decay(self):
+        self._hits = {key: hits // 2 for key, hits in self._hits.items() if hits > 1}
+        self._next_decay = time.monotonic() + self.decay_interval
+
+    def schedule(self, key, refresh):
+        """Queue ``refresh`` for a stale key unless it is already queued or running"""
+        with self._cond:
+            if key in self._pending or key in self._running:
+                return False
+            if len(self._pending) >= self.max_pending:
+                coldest = min(self._pending, key=lambda pending: self._hits.get(pending, 0))
+                self._counters['dropped'] += 1
+                if self._hits.get(coldest, 0) >= self._hits.get(key, 0):
+                    return False
+                del self._pending[coldest]
+            self._pending[key] = refresh
+            self._counters['scheduled'] += 1
+            self._ensure_started()
+            self._cond.notify()
+        return True
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='catalog-refresh')
+        threading.Thread(target=self._dispatch, name='catalog-refresh-dispatch', daemon=True).start()
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                while not self._pending or len(self._running) >= self.concurrency:
+                    self._cond.wait()
+                key = max(self._pending, key=lambda pending: self._hits.get(pending, 0))
+                refresh = self._pending.pop(key)
+                self._running.add(key)
+            self._pool.submit(self._run, key, refresh)
+
+    def _run(self, key, refresh):
+        try:
+            refresh()
+            outcome = 'completed'
+        except Exception as e:
+            print(f"Background refresh failed for {key}: {str(e)}")
+            outcome = 'failed'
+        with self._cond:
+            self._counters[outcome] += 1
+            self._running.discard(key)
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return dict(
+                self._counters,
+                pending=len(self._pending),
+                running=len(self._running),
+                tracked_keys=len(self._hits),
+                concurrency=self.concurrency,
+            )
@@ -0,0 +1,124 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timezone
+from sqlalchemy.exc import IntegrityError
+from .models import RevokedToken
+from . import db
+
+
+class BloomFilter:
+    """Set membership with no false negatives and a bounded false positive rate"""
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    """Revoked token ids, stored in the DB and checked through a per-worker Bloom filter.
+
+    Only ids the filter reports as possibly revoked cost a query. Each
+    worker loads rows added since the last id it saw every
+    ``refresh_interval`` seconds, and rebuilds the filter from unexpired
+    rows every ``rebuild_interval`` so it does not fill up.
+    """
+
+    def __init__(self, capacity=100000, refresh_interval=5, rebuild_interval=3600):
+        self.capacity = capacity
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self._filter = BloomFilter(capacity)
+        self._last_id = 0
+        self._refreshed_at = 0.0
+        self._rebuilt_at = 0.0
+        self._lock = threading.Lock()
+        self._counters = {'checks': 0, 'possible': 0, 'revoked': 0, 'false_positives': 0, 'refreshes': 0}
+
+    def init_app(self, app):
+        self.capacity = app.config['REVOCATION_CAPACITY']
+        self.refresh_interval = app.config['REVOCATION_REFRESH_INTERVAL']
+        # A new filter has to be reloaded from the first row
+        self._filter = BloomFilter(self.capacity)
+        self._last_id = 0
+        self._refreshed_at = 0.0
+        self._rebuilt_at = 0.0
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now - self._refreshed_at < self.refresh_interval:
+            return
+        with self._lock:
+            if now - self._refreshed_at < self.refresh_interval:
+                return
+            if now - self._rebuilt_at >= self.rebuild_interval or self._filter.count >= self.capacity:
+                RevokedToken.query.filter(RevokedToken.expires_at < datetime.now(tz=timezone.utc)).delete()
+                db.session.commit()
+                self._filter = BloomFilter(self.capacity)
+                self._last_id = 0
+                self._rebuilt_at = now
+
+            rows = db.session.query(RevokedToken.id, RevokedToken.jti).filter(
+                RevokedToken.id > self._last_id
+            ).order_by(RevokedToken.id).all()
+            for row_id, jti in rows:
+                self._filter.add(jti)
+                self._last_id = row_id
+            self._refreshed_at = now
+            self._counters['refreshes'] += 1
+
+    def is_revoked(self, jti):
+        if not jti:
+            return False
+        self._refresh()
+        with self._lock:
+            self._counters['checks'] += 1
+            if jti not in self._filter:
+                return False
+            self._counters['possible'] += 1
+
+        revoked = db.session.query(RevokedToken.id).filter_by(jti=jti).first() is not None
+        with self._lock:
+            self._counters['revoked' if revoked else 'false_positives'] += 1
+        return revoked
+
+    def revoke(self, jti, expires_at):
+        """Record a token id until it would have expired anyway"""
+        db.session.add(RevokedToken(jti=jti, expires_at=datetime.fromtimestamp(expires_at, tz=timezone.utc)))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Already revoked
+            db.session.rollback()
+        with self._lock:
+            self._filter.add(jti)
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self._counters,
+                entries=self._filter.count,
+                capacity=self.capacity,
+                filter_bytes=len(self._filter.bits),
+                hashes=self._filter.hashes,
+            )
+
+
+revocations = RevocationList()
@@ -1,16 +1,26 @@
-from flask import Blueprint, request, jsonify, send_from_directory
-from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
+from flask import Blueprint, current_app, g, request, jsonify
 from .models import User, Profile, WatchlistItem, ViewingHistory, PredefinedAvatar
+from .auth import issue_token, require_auth, require_account_owner, require_profile_owner, require_stats_enabled
+from .passwords import hasher, HasherBusy
+from .users import current_identity, load_user_by_email, profile_lists, user_payload, user_payloads
+from .querycount import query_budget
+from .versions import versions, profiles_key, watchlist_key, history_key
+from .serializers import (
+    PROFILE, PROFILE_CREATED, PROFILE_DETAIL, PROFILE_LIST_ITEM, WATCHLIST_ITEM, HISTORY_ITEM
+)
+from .watchlist import add_item, remove_item
+from .throttle import throttle
+from .revocation import revocations
 from . import db
 from datetime import datetime, timezone
-import json
-import os
-import uuid
+import time
 from PIL import Image
 
 api = Blueprint('api', __name__)
 
+# Keys a profile owner may change through PUT /profiles/<id>
+EDITABLE_PROFILE_FIELDS = ('name', 'avatar_url', 'is_kids')
+
 import base64
 from io import BytesIO
 
@@ -41,23 +51,64 @@ def validate_and_process_image(base64_data):
     except Exception as e:
         raise ValueError(f"Invalid image data: {str(e)}")
 
+def hasher_busy_response():
+    response = jsonify({'error': 'Too many sign-in attempts right now, please try again'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+def throttled_response(retry_after):
+    response = jsonify({'error': 'Too many attempts, please try again later'})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
+def profile_list_response(user_id):
+    """The user's profiles, or 304 when the client's ETag is still current.
+
+    Served from the shared profile list cache when possible, which needs
+    no queries at all.
+    """
+    cached = profile_lists.get(user_id)
+    if cached is not None:
+        etag, body = cached
+        if versions.matches(etag):
+            return versions.not_modified(etag)
+        return versions.tag(current_app.response_class(body, mimetype='application/json'), etag)
+
+    started_at = time.time()
+    etag = versions.etag(profiles_key(user_id))
+    if versions.matches(etag):
+        return versions.not_modified(etag)
+
+    identity = current_identity()
+    if identity is None:
+        return jsonify({'error': 'User not found'}), 404
+    response = jsonify(PROFILE_LIST_ITEM.dump_many(identity.profiles.values()))
+    profile_lists.fill(user_id, etag, response.get_data(), started_at)
+    return versions.tag(response, etag)
+
 @api.route("/auth/register", methods=['POST'])
 def register():
     data = request.get_json()
     email = data.get('email')
     password = data.get('password')
     
+    retry_after = throttle.check(request, 'register')
+    if retry_after:
+        return throttled_response(retry_after)
+    
     print(f"Register attempt - Email: {email}")
     
     if not email or not password:
         return jsonify({'error': 'Email and password are required'}), 400
+    if not isinstance(email, str) or not isinstance(password, str):
+        return jsonify({'error': 'Email and password must be strings'}), 400
         
     user = User.query.filter_by(email=email).first()
     if user:
         return jsonify({'error': 'Email already exists'}), 400
         
     try:
-        password_hash = generate_password_hash(password, method='pbkdf2:sha256')
+        password_hash = hasher.hash(password)
         
         new_user = User(
             email=email,
@@ -68,15 +119,12 @@ def register():
         
         return jsonify({
             'message': 'Registration successful',
-            'access_token': f'shark_streamer_token_{new_user.id}',
-            'user': {
-                'id': new_user.id, 
-                'email': new_user.email,
-                'subscription_plan': new_user.subscription_plan,
-                'profiles': []
-            }
+            'access_token': issue_token(new_user.id, new_user.subscription_plan),
+            'user': user_payload(new_user, [])
         }), 201
         
+    except HasherBusy:
+        return hasher_busy_response()
     except Exception as e:
         db.session.rollback()
         print(f"Registration error: {str(e)}")
@@ -88,9 +136,17 @@ def login():
     email = data.get('email')
     password = data.get('password')
     
+    # Before any lookup or hashing, so credential stuffing stays cheap
+    retry_after = throttle.check(request, 'login', email)
+    if retry_after:
+        return throttled_response(retry_after)
+    
     print(f"Login attempt - Email: {email}")
     
-    user = User.query.filter_by(email=email).first()
+    if not isinstance(email, str) or not isinstance(password, str):
+        return jsonify({'error': 'You have entered an invalid email or password'}), 400
+    
+    user, profiles = load_user_by_email(email)
     print(f"User found: {user is not None}")
     print(f"User ID: {user.id if user else None}")
     
@@ -98,126 +154,105 @@ def login():
         return jsonify({'error': 'You have entered an invalid email or password'}), 400
     
     try:
-        if check_password_hash(user.password, password):
-            profiles = []
-            for profile in user.profiles:
-                profiles.append({
-                    'id': profile.id,
-                    'name': profile.name,
-                    'avatar_url': profile.avatar_url,
-                    'is_kids': profile.is_kids
-                })
-            
+        valid, new_hash = hasher.verify(user.password, password)
+        if valid:
+            if new_hash:
+                # Stored under an older hash policy
+                User.query.filter_by(id=user.id).update({'password': new_hash})
+                db.session.commit()
+
+            payload = user_payload(user, profiles)
+            user_payloads.set(user.id, payload)
             return jsonify({
                 'message': 'Login successful',
-                'access_token': f'shark_streamer_token_{user.id}',
-                'user': {
-                    'id': user.id,
-                    'email': user.email,
-                    'subscription_plan': user.subscription_plan,
-                    'profiles': profiles
-                }
+                'access_token': issue_token(user.id, user.subscription_plan),
+                'user': payload
             }), 200
         else:
             print("Password check failed")
             return jsonify({'error': 'Invalid credentials'}), 400
             
+    except HasherBusy:
+        return hasher_busy_response()
     except Exception as e:
         print(f"Login error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 @api.route("/auth/me", methods=['GET'])
+@require_auth
 def get_current_user():
     try:
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({'error': 'No valid token provided'}), 401
-        
-        token = auth_header.split(' ')[1]
-        if not token.startswith('shark_streamer_token_'):
-            return jsonify({'error': 'Invalid token format'}), 401
-        
-        try:
-            user_id = int(token.split('_')[-1])
-        except ValueError:
-            return jsonify({'error': 'Invalid token format'}), 401
-        
-        user = User.query.get(user_id)
-        if not user:
+        payload = user_payloads.get(g.claims['sub'])
+        if payload is None:
             return jsonify({'error': 'User not found'}), 404
         
-        profiles = []
-        for profile in user.profiles:
-            profiles.append({
-                'id': profile.id,
-                'name': profile.name,
-                'avatar_url': profile.avatar_url,
-                'is_kids': profile.is_kids
-            })
-        
-        return jsonify({
-            'user': {
-                'id': user.id,
-                'email': user.email,
-                'subscription_plan': user.subscription_plan,
-                'profiles': profiles
-            }
-        }), 200
+        return jsonify({'user': payload}), 200
         
     except Exception as e:
         print(f"Get current user error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@api.route("/auth/stats", methods=['GET'])
+@require_stats_enabled
+def get_auth_stats():
+    """Throttling, password hashing, revocation and profile list cache counters for this worker"""
+    return jsonify({
+        'throttle': throttle.stats(),
+        'password_hashing': hasher.stats(),
+        'revocation': revocations.stats(),
+        'profile_lists': profile_lists.stats()
+    }), 200
+
 @api.route("/auth/logout", methods=['POST'])
+@require_auth
 def logout():
     try:
+        if g.claims.get('jti'):
+            revocations.revoke(g.claims['jti'], g.claims['exp'])
         return jsonify({'message': 'Logout successful'}), 200
     except Exception as e:
         print(f"Logout error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
 @api.route("/profiles", methods=['GET'])
+@require_auth
+@query_budget(2)
 def get_profiles():
-    user_id = request.args.get('user_id', type=int)
     try:
-        profiles = Profile.query.filter_by(user_id=user_id).all()
-        return jsonify([{
-            'id': p.id,
-            'name': p.name,
-            'avatar_url': p.avatar_url,
-            'is_kids': p.is_kids,
-            'created_at': p.created_at.isoformat() if p.created_at else None
-        } for p in profiles])
+        user_id = request.args.get('user_id', g.claims['sub'], type=int)
+        if user_id != g.claims['sub']:
+            return jsonify({'error': 'User not found'}), 404
+
+        return profile_list_response(user_id)
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
 @api.route("/profiles/<int:profile_id>", methods=['GET'])
+@require_auth
+@query_budget(1)
+@require_profile_owner
 def get_profile(profile_id):
     try:
-        profile = Profile.query.get(profile_id)
-        if not profile:
-            return jsonify({'error': 'Profile not found'}), 404
-            
-        return jsonify({
-            'id': profile.id,
-            'user_id': profile.user_id,
-            'name': profile.name,
-            'avatar_url': profile.avatar_url,
-            'is_kids': profile.is_kids,
-            'created_at': profile.created_at.isoformat() if profile.created_at else None,
-            'updated_at': profile.updated_at.isoformat() if profile.updated_at else None
-        })
+        return jsonify(PROFILE_DETAIL.dump(current_identity().profile(profile_id)))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @api.route('/profiles', methods=['POST'])
+@require_auth
+@query_budget(3)
 def create_profile():
     try:
         data = request.json
         print("Received data:", data)
 
+        # Profiles are created for the token's user; clients may still send
+        # its id, as a number or a string
+        user_id = g.claims['sub']
+        if data.get('user_id') is not None and str(data['user_id']) != str(user_id):
+            return jsonify({'error': 'User not found'}), 404
+
         new_profile = Profile(
-            user_id=data['user_id'],
+            user_id=user_id,
             name=data['name'],
             avatar_url=data.get('avatar_url'),
             is_kids=data.get('is_kids', False),
@@ -226,18 +261,11 @@ def create_profile():
         )
         
         db.session.add(new_profile)
+        versions.bump(profiles_key(new_profile.user_id))
         db.session.commit()
+        user_payloads.invalidate(new_profile.user_id)
         
-        return jsonify({
-            "id": new_profile.id,
-            "name": new_profile.name,
-            "avatar_url": new_profile.avatar_url,
-            "is_kids": new_profile.is_kids,
-            "user_id": new_profile.user_id,
-            "created_at": new_profile.created_at.isoformat() if new_profile.created_at else None,
-            "updated_at": new_profile.updated_at.isoformat() if new_profile.updated_at else None,
-            "message": "Profile created successfully"
-        }), 201
+        return jsonify(dict(PROFILE_CREATED.dump(new_profile), message="Profile created successfully")), 201
         
     except KeyError as e:
         return jsonify({"error": f"Missing required field: {str(e)}"}), 400
@@ -246,30 +274,27 @@ def create_profile():
         return jsonify({"error": str(e)}), 400
 
 @api.route("/profiles/user/<int:user_id>", methods=['GET'])
+@require_auth
+@query_budget(2)
+@require_account_owner
 def get_user_profiles(user_id):
     try:
-        profiles = Profile.query.filter_by(user_id=user_id).all()
-        print(f"Profiles for user_id {user_id}: {profiles}")
-
-        return jsonify([{
-            'id': p.id,
-            'name': p.name,
-            'avatar_url': p.avatar_url,
-            'is_kids': p.is_kids,
-            'created_at': p.created_at.isoformat() if p.created_at else None
-        } for p in profiles])
+        return profile_list_response(user_id)
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
 @api.route("/profiles/<int:profile_id>", methods=['DELETE'])
+@require_auth
+@query_budget(11)
+@require_profile_owner
 def delete_profile(profile_id):
     try:
-        profile = Profile.query.get(profile_id)
-        if not profile:
-            return jsonify({'error': 'Profile not found'}), 404
+        profile = db.session.get(Profile, profile_id)
             
         db.session.delete(profile)
+        versions.bump(profiles_key(profile.user_id), watchlist_key(profile_id), history_key(profile_id))
         db.session.commit()
+        user_payloads.invalidate(profile.user_id)
         
         return jsonify({'message': 'Profile deleted successfully'}), 200
     except Exception as e:
@@ -277,96 +302,78 @@ def delete_profile(profile_id):
         return jsonify({'error': str(e)}), 400
 
 @api.route("/profiles/<int:profile_id>", methods=['PUT'])
+@require_auth
+@query_budget(5)
+@require_profile_owner
 def update_profile(profile_id):
     try:
-        profile = Profile.query.get(profile_id)
-        if not profile:
-            return jsonify({'error': 'Profile not found'}), 404
+        profile = db.session.get(Profile, profile_id)
 
         data = request.json
+        unknown = sorted(set(data) - set(EDITABLE_PROFILE_FIELDS))
+        if unknown:
+            return jsonify({'error': f"Fields cannot be updated: {', '.join(unknown)}"}), 400
         
-        for key, value in data.items():
-            if hasattr(profile, key):
-                setattr(profile, key, value)
+        for key in EDITABLE_PROFILE_FIELDS:
+            if key in data:
+                setattr(profile, key, data[key])
         
         profile.updated_at = datetime.now(tz=timezone.utc)
+        versions.bump(profiles_key(profile.user_id))
         db.session.commit()
+        user_payloads.invalidate(profile.user_id)
         
         return jsonify({
             'message': 'Profile updated successfully',
-            'profile': {
-                'id': profile.id,
-                'user_id': profile.user_id,
-                'name': profile.name,
-                'avatar_url': profile.avatar_url,
-                'is_kids': profile.is_kids
-            }
+            'profile': PROFILE.dump(profile)
         }), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 400
 @api.route("/watchlist/<int:profile_id>", methods=['GET'])
+@require_auth
+@query_budget(3)
+@require_profile_owner
 def get_watchlist(profile_id):
     try:
-        profile = Profile.query.get(profile_id)
-        if not profile:
-            return jsonify({'error': 'Profile not found'}), 404
-            
-        watchlist_items = profile.watchlist_items.all()
-        return jsonify([{
-            'id': item.id,
-            'movie_id': item.movie_id,
-            'movie_title': item.movie_title,
-            'movie_poster': item.movie_poster,
-            'movie_type': item.movie_type,
-            'added_at': item.added_at.isoformat() if item.added_at else None
-        } for item in watchlist_items])
+        etag = versions.etag(watchlist_key(profile_id))
+        if versions.matches(etag):
+            return versions.not_modified(etag)
+
+        watchlist_items = db.session.query(*WATCHLIST_ITEM.columns(WatchlistItem)).filter(
+            WatchlistItem.profile_id == profile_id
+        ).all()
+        return versions.tag(jsonify(WATCHLIST_ITEM.dump_many(watchlist_items)), etag)
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
 @api.route("/watchlist/<int:profile_id>/<string:movie_id>", methods=['POST'])
+@require_auth
+@query_budget(3)
+@require_profile_owner
 def add_to_watchlist(profile_id, movie_id):
     try:
-        profile = Profile.query.get(profile_id)
-        
-        if not profile:
-            return jsonify({'error': 'Profile not found'}), 404
-        
-        existing_item = WatchlistItem.query.filter_by(
-            profile_id=profile_id, 
-            movie_id=movie_id
-        ).first()
-        
-        if existing_item:
-            return jsonify({
-                'success': True,
-                'message': 'Movie is already in watchlist'
-            }), 200
-        
         data = request.json
-        new_item = WatchlistItem(
-            profile_id=profile_id,
-            movie_id=movie_id,
+        item = add_item(
+            profile_id,
+            movie_id,
             movie_title=data.get('movie_title', ''),
             movie_poster=data.get('movie_poster', ''),
-            movie_type=data.get('movie_type', 'movie'),
-            added_at=datetime.now(tz=timezone.utc)
+            movie_type=data.get('movie_type', 'movie')
         )
         
-        db.session.add(new_item)
-        db.session.commit()
+        if item is None:
+            return jsonify({
+                'success': True,
+                'added': False,
+                'message': 'Movie is already in watchlist'
+            }), 200
             
         return jsonify({
             'success': True,
+            'added': True,
             'message': 'Movie added to watchlist',
-            'item': {
-                'id': new_item.id,
-                'movie_id': new_item.movie_id,
-                'movie_title': new_item.movie_title,
-                'movie_poster': new_item.movie_poster,
-                'movie_type': new_item.movie_type,
-                'added_at': new_item.added_at.isoformat()
-            }
+            'item': WATCHLIST_ITEM.dump(item)
         }), 200
             
     except Exception as e:
@@ -375,19 +382,14 @@ def add_to_watchlist(profile_id, movie_id):
         return jsonify({'error': str(e)}), 500
 
 @api.route("/watchlist/<int:profile_id>/<string:movie_id>", methods=['DELETE'])
+@require_auth
+@query_budget(3)
+@require_profile_owner
 def remove_from_watchlist(profile_id, movie_id):
     try:
-        item = WatchlistItem.query.filter_by(
-            profile_id=profile_id, 
-            movie_id=movie_id
-        ).first()
-        
-        if not item:
+        if not remove_item(profile_id, movie_id):
             return jsonify({'error': 'Item not found in watchlist'}), 404
             
-        db.session.delete(item)
-        db.session.commit()
-            
         return jsonify({
             'success': True,
             'message': 'Movie removed from watchlist'
@@ -397,29 +399,27 @@ def remove_from_watchlist(profile_id, movie_id):
         return jsonify({'error': str(e)}), 400
 
 @api.route("/history/<int:profile_id>", methods=['GET'])
+@require_auth
+@query_budget(3)
+@require_profile_owner
 def get_viewing_history(profile_id):
     try:
-        profile = Profile.query.get(profile_id)
-        if not profile:
-            return jsonify({'error': 'Profile not found'}), 404
-            
-        history_items = profile.viewing_history.order_by(
-            ViewingHistory.watched_at.desc()
-        ).all()
+        etag = versions.etag(history_key(profile_id))
+        if versions.matches(etag):
+            return versions.not_modified(etag)
+
+        history_items = db.session.query(*HISTORY_ITEM.columns(ViewingHistory)).filter(
+            ViewingHistory.profile_id == profile_id
+        ).order_by(ViewingHistory.watched_at.desc()).all()
         
-        return jsonify([{
-            'id': item.id,
-            'movie_id': item.movie_id,
-            'movie_title': item.movie_title,
-            'movie_poster': item.movie_poster,
-            'movie_type': item.movie_type,
-            'watched_at': item.watched_at.isoformat() if item.watched_at else None,
-            'progress_percent': item.progress_percent
-        } for item in history_items])
+        return versions.tag(jsonify(HISTORY_ITEM.dump_many(history_items)), etag)
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
 @api.route("/history/<int:profile_id>", methods=['POST'])
+@require_auth
+@query_budget(4)
+@require_profile_owner
 def add_to_history(profile_id):
     try:
         data = request.json
@@ -445,6 +445,7 @@ def add_to_history(profile_id):
             )
             db.session.add(new_item)
         
+        versions.bump(history_key(profile_id))
         db.session.commit()
         
         return jsonify({
@@ -458,24 +459,28 @@ def add_to_history(profile_id):
         return jsonify({'error': str(e)}), 500
 
 @api.route("/subscription/<int:user_id>", methods=['PUT'])
+@require_auth
+@query_budget(1)
+@require_account_owner
 def update_subscription(user_id):
     try:
-        user = User.query.get(user_id)
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-
         data = request.json
         new_plan = data.get('subscription_plan')
         
         if new_plan not in ['basic', 'standard', 'premium']:
             return jsonify({'error': 'Invalid subscription plan'}), 400
         
-        user.subscription_plan = new_plan
+        updated = User.query.filter_by(id=user_id).update({'subscription_plan': new_plan})
+        if not updated:
+            return jsonify({'error': 'User not found'}), 404
         db.session.commit()
+        user_payloads.invalidate(user_id)
         
         return jsonify({
             'message': 'Subscription plan updated successfully',
-            'subscription_plan': user.subscription_plan
+            'subscription_plan': new_plan,
+            # The plan is carried in the token, so hand out one with the new plan
+            'access_token': issue_token(user_id, new_plan)
         }), 200
     except Exception as e:
         db.session.rollback()
@@ -529,12 +534,13 @@ def get_plans():
     }), 200
 
 @api.route("/profiles/<int:profile_id>/avatar", methods=['PUT'])
+@require_auth
+@query_budget(5)
+@require_profile_owner
 def update_profile_avatar(profile_id):
     """Update profile avatar with base64 image data"""
     try:
-        profile = Profile.query.get(profile_id)
-        if not profile:
-            return jsonify({'error': 'Profile not found'}), 404
+        profile = db.session.get(Profile, profile_id)
 
         data = request.json
         avatar_data = data.get('avatar_data')
@@ -550,18 +556,14 @@ def update_profile_avatar(profile_id):
             
             profile.avatar_url = processed_avatar
             profile.updated_at = datetime.now(tz=timezone.utc)
+            versions.bump(profiles_key(profile.user_id))
             db.session.commit()
+            user_payloads.invalidate(profile.user_id)
             
             return jsonify({
                 'success': True,
                 'message': 'Avatar updated successfully',
-                'profile': {
-                    'id': profile.id,
-                    'user_id': profile.user_id,
-                    'name': profile.name,
-                    'avatar_url': profile.avatar_url,
-                    'is_kids': profile.is_kids
-                }
+                'profile': PROFILE.dump(profile)
             }), 200
             
         except ValueError as e:
@@ -0,0 +1,100 @@
+import fcntl
+import os
+import threading
+import time
+
+TICK = 1  # Seconds between checks for due jobs
+
+
+class Scheduler:
+    """Runs periodic background jobs inside the app context.
+
+    Every gunicorn worker runs its own scheduler thread, so each job run
+    takes a non-blocking file lock first; when another worker on the host
+    already holds it the run is skipped. The lock file also records when
+    the job last started, and a worker whose own timer fires before the
+    interval has passed since then skips the run and waits for the rest.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.jobs = []
+        self.enabled = False
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.jobs = []
+        self.enabled = app.config['CATALOG_SCHEDULER_ENABLED']
+        self.lock_dir = os.path.join(app.instance_path, 'locks')
+        app.extensions['scheduler'] = self
+        if self.enabled:
+            # Started lazily so the thread lives in the worker, not in a
+            # master process that forks after create_app
+            app.before_request(self.ensure_started)
+
+    def add_job(self, name, func, interval, initial_delay=0):
+        self.jobs.append({
+            'name': name,
+            'func': func,
+            'interval': interval,
+            'next_run': time.monotonic() + initial_delay,
+        })
+
+    def ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='catalog-scheduler', daemon=True)
+            self._thread.start()
+
+    def run_job(self, job):
+        os.makedirs(self.lock_dir, exist_ok=True)
+        # Opened without truncating, since the file holds the last run time
+        with open(os.path.join(self.lock_dir, f"{job['name']}.lock"), 'a+') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            try:
+                lock_file.seek(0)
+                try:
+                    last_run = float(lock_file.read() or 0)
+                except ValueError:
+                    last_run = 0
+                now = time.time()
+                # A tick of slack so a worker's own schedule never trips this
+                if 0 <= now - last_run < job['interval'] - TICK:
+                    job['next_run'] = time.monotonic() + job['interval'] - (now - last_run)
+                    return False
+                lock_file.truncate(0)
+                lock_file.write(repr(now))
+                lock_file.flush()
+                with self.app.app_context():
+                    job['func']()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return True
+
+    def _run(self):
+        while True:
+            now = time.monotonic()
+            for job in self.jobs:
+                if job['next_run'] > now:
+                    continue
+                job['next_run'] = now + job['interval']
+                try:
+                    self.run_job(job)
+                except Exception as e:
+                    print(f"Scheduled job {job['name']} failed: {str(e)}")
+            time.sleep(TICK)
+
+
+scheduler = Scheduler()
@@ -0,0 +1,155 @@
+import base64
+import binascii
+import heapq
+import json
+from .tmdb import tmdb
+
+PAGE_SIZE = 20
+PAGE_TTL = 60 * 10
+MAX_UPSTREAM_PAGE = 500
+# Upstream pages one request may read per source before handing back a cursor
+MAX_PAGES_PER_REQUEST = 3
+SEARCH_TYPES = ('movie', 'tv')
+# How many recently served titles the cursor remembers for de-duplication
+SEEN_WINDOW = 40
+
+
+def normalize_query(query):
+    return ' '.join((query or '').lower().split())
+
+
+def is_valid_item(item):
+    """Server-side port of filterValidItems from the frontend"""
+    return bool(
+        (item.get('title') or item.get('name'))
+        and isinstance(item.get('id'), int) and item['id'] > 0
+        and (item.get('poster_path') or item.get('backdrop_path'))
+        and (item.get('overview') or '').strip()
+        and (item.get('popularity') or 0) > 0
+    )
+
+
+def encode_cursor(state):
+    raw = json.dumps(state, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor from a previous page; raises ValueError if it is malformed"""
+    if not cursor:
+        return {'pos': {media_type: [1, 0] for media_type in SEARCH_TYPES}, 'seen': []}
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        positions = state['pos']
+        for media_type in SEARCH_TYPES:
+            position = positions.get(media_type)
+            if position is not None and not (
+                isinstance(position, list) and len(position) == 2
+                and all(type(value) is int and value >= 0 for value in position)
+            ):
+                raise ValueError
+        seen = state.get('seen', [])
+        if not isinstance(seen, list) or not all(isinstance(key, str) for key in seen):
+            raise ValueError
+        return state
+    except (ValueError, KeyError, TypeError, AttributeError, binascii.Error):
+        raise ValueError('Invalid cursor')
+
+
+def iter_source(media_type, query, page, offset, max_pages=MAX_PAGES_PER_REQUEST):
+    """Yield ``(item, next_position)`` for valid results, page by page.
+
+    After ``max_pages`` upstream pages it yields ``(None, position)`` and
+    stops, so a sparse result set is walked over several requests.
+    """
+    fetched = 0
+    while page <= MAX_UPSTREAM_PAGE:
+        if fetched == max_pages:
+            yield None, [page, 0]
+            return
+        data = tmdb.get_json(f'search/{media_type}', {
+            'query': query,
+            'page': page,
+            'include_adult': 'false',
+        })
+        fetched += 1
+        results = data.get('results') or []
+        for index in range(offset, len(results)):
+            item = results[index]
+            if is_valid_item(item):
+                yield dict(item, media_type=media_type), [page, index + 1]
+        if not results or page >= (data.get('total_pages') or 0):
+            return
+        page += 1
+        offset = 0
+
+
+def merge_page(query, state):
+    """Take the next page from a popularity-ordered merge of movie and TV results"""
+    positions = dict(state['pos'])
+    seen = list(state.get('seen', []))
+    seen_keys = set(seen)
+
+    heads = []
+    sources = {}
+    paused = False
+
+    def advance(order, media_type):
+        nonlocal paused
+        head = next(sources[media_type], None)
+        if head is None:
+            positions[media_type] = None
+        elif head[0] is None:
+            # Out of pages for this request; the rest of the merge waits for the next cursor
+            positions[media_type] = head[1]
+            paused = True
+        else:
+            heapq.heappush(heads, (-head[0]['popularity'], order, media_type, head))
+
+    for order, media_type in enumerate(SEARCH_TYPES):
+        position = positions.get(media_type)
+        if position is None:
+            continue
+        sources[media_type] = iter_source(media_type, query, *position)
+        advance(order, media_type)
+
+    results = []
+    while heads and not paused and len(results) < PAGE_SIZE:
+        _, order, media_type, (item, next_position) = heapq.heappop(heads)
+        positions[media_type] = next_position
+
+        key = f"{media_type[0]}{item['id']}"
+        if key not in seen_keys:
+            seen_keys.add(key)
+            seen.append(key)
+            results.append(item)
+
+        advance(order, media_type)
+
+    # A paused page can be short, or even empty, and still have more after it
+    has_next_page = bool(heads) or paused
+    next_cursor = None
+    if has_next_page:
+        next_cursor = encode_cursor({'pos': positions, 'seen': seen[-SEEN_WINDOW:]})
+
+    return {
+        'results': results,
+        'hasNextPage': has_next_page,
+        'nextCursor': next_cursor,
+    }
+
+
+def search_page(query, cursor=None):
+    """Return ``(body, cache_tier)`` for one page of merged search results"""
+    query = normalize_query(query)
+    state = decode_cursor(cursor)
+    if not query:
+        return json.dumps({'results': [], 'hasNextPage': False, 'nextCursor': None}).encode(), None
+
+    return tmdb.cached(
+        f'search:{query}:{cursor or ""}',
+        PAGE_TTL,
+        lambda: json.dumps(merge_page(query, state)).encode(),
+        cross_worker=False
+    )
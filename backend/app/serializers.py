@@ -0,0 +1,116 @@
+from operator import attrgetter
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def field(key, source=None, convert=None):
+    """An output key read from attribute ``source`` (default: the key) and optionally converted"""
+    return key, source or key, convert
+
+
+class Schema:
+    """Response shape declared once and compiled into a single attribute getter.
+
+    Works on ORM instances and on query rows alike, as long as the
+    attribute names match. ``columns(model)`` lists the model columns
+    to select so lists can be loaded as rows, skipping the ORM.
+    """
+
+    def __init__(self, *fields):
+        fields = [field(spec) if isinstance(spec, str) else spec for spec in fields]
+        self.keys = tuple(key for key, _, _ in fields)
+        self.sources = tuple(source for _, source, _ in fields)
+        self._converters = tuple((index, convert) for index, (_, _, convert) in enumerate(fields) if convert)
+        getter = attrgetter(*self.sources)
+        # attrgetter returns a bare value, not a tuple, for a single attribute
+        self._get = getter if len(self.sources) > 1 else lambda obj: (getter(obj),)
+
+    def dump(self, obj):
+        values = self._get(obj)
+        if self._converters:
+            values = list(values)
+            for index, convert in self._converters:
+                values[index] = convert(values[index])
+        return dict(zip(self.keys, values))
+
+    def dump_many(self, objs):
+        dump = self.dump
+        return [dump(obj) for obj in objs]
+
+    def columns(self, model):
+        return [getattr(model, source) for source in self.sources]
+
+
+# Profiles as loaded by users._load, whose row columns are prefixed
+PROFILE_SUMMARY = Schema(
+    field('id', 'profile_id'),
+    field('name', 'profile_name'),
+    field('avatar_url', 'profile_avatar_url'),
+    field('is_kids', 'profile_is_kids'),
+)
+PROFILE_LIST_ITEM = Schema(
+    field('id', 'profile_id'),
+    field('name', 'profile_name'),
+    field('avatar_url', 'profile_avatar_url'),
+    field('is_kids', 'profile_is_kids'),
+    field('created_at', 'profile_created_at', isoformat),
+)
+PROFILE_DETAIL = Schema(
+    field('id', 'profile_id'),
+    field('user_id', 'id'),  # The row's own id column is the user's
+    field('name', 'profile_name'),
+    field('avatar_url', 'profile_avatar_url'),
+    field('is_kids', 'profile_is_kids'),
+    field('created_at', 'profile_created_at', isoformat),
+    field('updated_at', 'profile_updated_at', isoformat),
+)
+
+# Profile model instances
+PROFILE = Schema('id', 'user_id', 'name', 'avatar_url', 'is_kids')
+PROFILE_CREATED = Schema(
+    'id', 'name', 'avatar_url', 'is_kids', 'user_id',
+    field('created_at', convert=isoformat),
+    field('updated_at', convert=isoformat),
+)
+
+WATCHLIST_ITEM = Schema(
+    'id', 'movie_id', 'movie_title', 'movie_poster', 'movie_type',
+    field('added_at', convert=isoformat),
+)
+HISTORY_ITEM = Schema(
+    'id', 'movie_id', 'movie_title', 'movie_poster', 'movie_type',
+    field('watched_at', convert=isoformat),
+    'progress_percent',
+)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider encoding with orjson.
+
+    Output matches the default provider's: keys sorted, and anything orjson
+    does not handle natively (dates, decimals, dataclasses) goes through
+    the same fallback.
+    """
+
+    options = orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        return self._encode(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def _encode(self, obj):
+        return orjson.dumps(obj, default=self.default, option=self.options)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._encode(obj) + b'\n', mimetype=self.mimetype)
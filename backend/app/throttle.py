@@ -0,0 +1,188 @@
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+
+# key hash, window start, slot expiry, previous window count, current window count
+SLOT = struct.Struct('<QddII')
+PROBES = 4
+
+
+def parse_rule(rule):
+    """``'10/60'`` means 10 attempts per 60 seconds"""
+    limit, _, window = rule.partition('/')
+    return int(limit), float(window or 60)
+
+
+class SlidingWindowTable:
+    """Fixed-size table of sliding-window counters in a memory-mapped file.
+
+    Every worker on the host maps the same file, so limits apply across
+    workers. Each check touches at most ``PROBES`` neighbouring slots; when
+    they are all taken the slot closest to expiry is reused, so memory
+    never grows with the number of keys.
+    """
+
+    def __init__(self, path, slots=65536):
+        self.path = path
+        self.slots = slots
+        self._map = None
+        self._fd = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._counters = {'checks': 0, 'rejected': 0, 'evictions': 0}
+        self._rejected_by_rule = {}
+
+    def configure(self, path, slots):
+        with self._lock:
+            if self._map is not None and (path, slots) != (self.path, self.slots):
+                # A table mapped for another app in this process must not be reused
+                self._map.close()
+                os.close(self._fd)
+                self._map = self._fd = self._pid = None
+            self.path = path
+            self.slots = slots
+
+    def _open(self):
+        # Mapped per process; forked workers must not share the parent's fd locks
+        if self._pid == os.getpid():
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        size = (self.slots + PROBES) * SLOT.size
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(fd).st_size != size:
+            # A resized table starts empty
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            if os.fstat(fd).st_size != size:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        self._fd = fd
+        self._map = mmap.mmap(fd, size)
+        self._pid = os.getpid()
+
+    def _slot_index(self, key):
+        digest = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little')
+        return digest or 1, digest % self.slots
+
+    def hit(self, rule_name, key, limit, window):
+        """Count one attempt; returns ``(allowed, retry_after_seconds)``"""
+        full_key = f'{rule_name}:{key}'
+        key_hash, base = self._slot_index(full_key)
+        now = time.time()
+        window_start = now - now % window
+
+        with self._lock:
+            self._open()
+            offset = base * SLOT.size
+            # Threads of this process are serialized by self._lock; other
+            # processes by a record lock on just these slots
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, PROBES * SLOT.size, offset)
+            try:
+                index, slot = self._find(base, key_hash, now)
+                _, start, _, previous, current = slot
+                if start != window_start:
+                    previous = current if start == window_start - window else 0
+                    current = 0
+
+                weight = 1 - (now - window_start) / window
+                allowed = previous * weight + current + 1 <= limit
+                if allowed:
+                    current += 1
+                self._map[index * SLOT.size:(index + 1) * SLOT.size] = SLOT.pack(
+                    key_hash, window_start, window_start + 2 * window, previous, current)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, PROBES * SLOT.size, offset)
+
+            self._counters['checks'] += 1
+            if allowed:
+                return True, 0
+            self._counters['rejected'] += 1
+            self._rejected_by_rule[rule_name] = self._rejected_by_rule.get(rule_name, 0) + 1
+
+        if current >= limit:
+            retry_after = window_start + window - now
+        else:
+            # When the previous window's weighted share has decayed enough
+            retry_after = window * (1 - (limit - 1 - current) / previous) - (now - window_start)
+        return False, max(1, math.ceil(retry_after))
+
+    def _find(self, base, key_hash, now):
+        """The slot holding ``key_hash``, else an empty or the soonest-expiring slot"""
+        candidates = []
+        for index in range(base, base + PROBES):
+            slot = SLOT.unpack_from(self._map, index * SLOT.size)
+            if slot[0] == key_hash:
+                return index, slot
+            candidates.append((index, slot))
+        index, slot = min(candidates, key=lambda candidate: candidate[1][2])
+        if slot[0] and slot[2] > now:
+            self._counters['evictions'] += 1
+        return index, (key_hash, 0.0, 0.0, 0, 0)
+
+    def stats(self):
+        with self._lock:
+            self._open()
+            now = time.time()
+            occupied = sum(
+                1 for index in range(self.slots + PROBES)
+                if SLOT.unpack_from(self._map, index * SLOT.size)[2] > now
+            )
+            checks = self._counters['checks']
+            return dict(
+                self._counters,
+                rejected_by_rule=dict(self._rejected_by_rule),
+                rejection_rate=round(self._counters['rejected'] / checks, 4) if checks else 0.0,
+                slots=self.slots,
+                occupied=occupied,
+                table_bytes=(self.slots + PROBES) * SLOT.size,
+            )
+
+
+class Throttle:
+    """Login and registration limits keyed by client IP and email"""
+
+    def __init__(self):
+        self.table = SlidingWindowTable(None)
+        self.rules = {}
+        self.trusted_proxies = 0
+
+    def init_app(self, app):
+        self.table.configure(app.config['THROTTLE_TABLE_PATH'], app.config['THROTTLE_TABLE_SLOTS'])
+        self.rules = {
+            'login-ip': parse_rule(app.config['THROTTLE_LOGIN_PER_IP']),
+            'login-email': parse_rule(app.config['THROTTLE_LOGIN_PER_EMAIL']),
+            'register-ip': parse_rule(app.config['THROTTLE_REGISTER_PER_IP']),
+        }
+        self.trusted_proxies = app.config['TRUSTED_PROXIES']
+
+    def client_ip(self, request):
+        if self.trusted_proxies and len(request.access_route) >= self.trusted_proxies:
+            return request.access_route[-self.trusted_proxies]
+        return request.remote_addr or 'unknown'
+
+    def check(self, request, action, email=None):
+        """Count an attempt against every rule for ``action``; returns seconds to wait, or 0"""
+        keys = [(f'{action}-ip', self.client_ip(request))]
+        if email and isinstance(email, str):
+            keys.append((f'{action}-email', email.strip().lower()))
+        for rule_name, key in keys:
+            if rule_name not in self.rules:
+                continue
+            limit, window = self.rules[rule_name]
+            allowed, retry_after = self.table.hit(rule_name, key, limit, window)
+            if not allowed:
+                return retry_after
+        return 0
+
+    def stats(self):
+        return self.table.stats()
+
+
+throttle = Throttle()
@@ -0,0 +1,111 @@
+import json
+from flask import current_app
+from .certifications import (
+    ratings_path, extract_certifications, pick_certification, lookup_certifications, store_certifications
+)
+from .tmdb import tmdb, UpstreamError
+from .upstream import upstream, DeadlineExceeded
+
+TITLE_TTL = 60 * 60
+# Documents missing a part after an upstream error are retried soon
+DEGRADED_TITLE_TTL = 60
+
+
+def pick_trailer(videos):
+    """Prefer an official YouTube trailer, then any trailer, then any video"""
+    results = (videos or {}).get('results', [])
+    youtube = [video for video in results if video.get('site', 'YouTube') == 'YouTube']
+    for candidates in (
+        [v for v in youtube if v.get('type') == 'Trailer' and v.get('official')],
+        [v for v in youtube if v.get('type') == 'Trailer'],
+        youtube,
+        results,
+    ):
+        if candidates:
+            return candidates[0]
+    return None
+
+
+def pick_logo(images):
+    """English (or language-neutral) logo first, matching getEnglishLogo"""
+    logos = (images or {}).get('logos', [])
+    if not logos:
+        return None
+    for logo in logos:
+        if logo.get('iso_639_1') in ('en', None):
+            return logo.get('file_path')
+    return logos[0].get('file_path')
+
+
+def fetch_title(media_type, tmdb_id, language='en-US'):
+    """Fetch every part of a title concurrently and assemble one document.
+
+    Returns ``(document, failed)`` where ``failed`` names the optional
+    parts that could not be fetched and were left empty.
+    """
+    pair = (media_type, tmdb_id)
+    certification = lookup_certifications([pair]).get(pair)
+    sources = {
+        'details': (f'{media_type}/{tmdb_id}', {'language': language}),
+        'credits': (f'{media_type}/{tmdb_id}/credits', None),
+        'similar': (f'{media_type}/{tmdb_id}/similar', None),
+        'videos': (f'{media_type}/{tmdb_id}/videos', None),
+        'images': (f'{media_type}/{tmdb_id}/images', None),
+    }
+    if certification is None:
+        # Only titles missing from the certification index need their ratings
+        sources['ratings'] = (ratings_path(media_type, tmdb_id), None)
+    results = upstream.gather({
+        name: (lambda path=path, params=params: tmdb.get_json(path, params))
+        for name, (path, params) in sources.items()
+    })
+    # Details are required; the other parts degrade to empty values
+    parts = {}
+    failed = []
+    for name, (result, error) in results.items():
+        if error is not None and name == 'details':
+            # Deadlines hit inside tmdb.fetch arrive wrapped in UpstreamError
+            if isinstance(error, DeadlineExceeded) or isinstance(error.__cause__, DeadlineExceeded):
+                raise UpstreamError(f"Upstream timed out for {media_type}/{tmdb_id}", status=504)
+            raise error
+        if error is not None:
+            print(f"Title part {name} failed for {media_type}:{tmdb_id}: {str(error)}")
+            failed.append(name)
+        parts[name] = result
+
+    if certification is None:
+        certifications = extract_certifications(media_type, parts['ratings'])
+        if parts['ratings'] is not None:
+            store_certifications({pair: certifications})
+        certification = pick_certification(certifications)
+
+    document = {
+        'type': media_type,
+        'id': tmdb_id,
+        'details': parts['details'],
+        'credits': parts['credits'] or {'cast': [], 'crew': []},
+        'similar': (parts['similar'] or {}).get('results', []),
+        'certification': certification,
+        'trailer': pick_trailer(parts['videos']),
+        'logo': pick_logo(parts['images']),
+    }
+    return document, failed
+
+
+def title_key(media_type, tmdb_id, language='en-US'):
+    return f'title:{media_type}/{tmdb_id}?language={language}'
+
+
+def get_title_document(media_type, tmdb_id, language='en-US'):
+    """Return ``(body, cache_tier)`` for the composite title document"""
+    app = current_app._get_current_object()
+
+    def load():
+        # Background refreshes run outside the request, and the certification
+        # index needs an app context
+        with app.app_context():
+            document, failed = fetch_title(media_type, tmdb_id, language)
+            body = json.dumps(document).encode()
+            return (body, DEGRADED_TITLE_TTL) if failed else body
+
+    return tmdb.cached(title_key(media_type, tmdb_id, language), TITLE_TTL, load, cross_worker=False)
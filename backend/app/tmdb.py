@@ -0,0 +1,236 @@
+import http.client
+import json
+import os
+import re
+import threading
+import time
+import urllib.parse
+from collections import deque
+
+from .cache import LRUCache, SQLiteCache, TieredCache
+from .singleflight import SingleFlight, StripedFileLock
+from .refresh import RefreshScheduler
+from .ratelimit import SharedTokenBucket
+from .breaker import CircuitBreaker
+from .upstream import upstream
+
+# Upstream paths the frontend's movieAPI uses, with how long each may be cached
+CATALOG_PATHS = [
+    (re.compile(r'^trending/all/week$'), 60 * 15),
+    (re.compile(r'^discover/(movie|tv)$'), 60 * 15),
+    (re.compile(r'^movie/top_rated$'), 60 * 15),
+    (re.compile(r'^search/(movie|tv)$'), 60 * 10),
+    (re.compile(r'^(movie|tv)/\d+$'), 60 * 60),
+    (re.compile(r'^(movie|tv)/\d+/(videos|images|credits|similar)$'), 60 * 60),
+    (re.compile(r'^movie/\d+/release_dates$'), 60 * 60 * 24),
+    (re.compile(r'^tv/\d+/content_ratings$'), 60 * 60 * 24),
+]
+
+# Query parameters forwarded upstream; anything else is dropped so the
+# cache key space stays bounded
+ALLOWED_PARAMS = {'language', 'with_networks', 'with_genres', 'query', 'page', 'include_adult', 'sort_by'}
+# Seconds every worker backs off for when upstream answers 429
+RATE_LIMIT_BACKOFF = 1.0
+
+
+class UpstreamError(Exception):
+    def __init__(self, message, status=502):
+        super().__init__(message)
+        self.status = status
+
+
+def ttl_for(path):
+    """Return the cache TTL for an allowed catalog path, or None if not allowed"""
+    for pattern, ttl in CATALOG_PATHS:
+        if pattern.match(path):
+            return ttl
+    return None
+
+
+def normalize_params(params):
+    params = params or {}
+    return sorted(
+        (key, str(value)) for key, value in params.items()
+        if key in ALLOWED_PARAMS and value is not None and str(value) != ''
+    )
+
+
+def cache_key(path, params=None):
+    return f"tmdb:{path}?{urllib.parse.urlencode(normalize_params(params))}"
+
+
+class TMDbClient:
+    """Cached access to the TMDb API shared by every catalog endpoint"""
+
+    def __init__(self, app=None):
+        self.cache = None
+        self.base_url = None
+        self.api_key = None
+        self.timeout = 10
+        self._latencies = deque(maxlen=2048)
+        self._lock = threading.Lock()
+        self._upstream_calls = 0
+        self._cross_worker_fills = 0
+        self.flights = SingleFlight()
+        self.locks = None
+        self.stale_ttl = 0
+        self.refresher = RefreshScheduler()
+        self.limiter = SharedTokenBucket(None)
+        self.rate_max_wait = 1.0
+        self.breaker = CircuitBreaker()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.base_url = app.config['TMDB_BASE_URL'].rstrip('/')
+        self.api_key = app.config['TMDB_API_KEY']
+        self.timeout = app.config['TMDB_TIMEOUT']
+        self.cache = TieredCache(
+            LRUCache(app.config['CATALOG_CACHE_MAX_ENTRIES']),
+            SQLiteCache(app.config['CATALOG_CACHE_PATH'])
+        )
+        self.locks = StripedFileLock(os.path.join(app.instance_path, 'locks', 'catalog'))
+        self.stale_ttl = app.config['CATALOG_STALE_TTL']
+        self.refresher.configure(
+            app.config['CATALOG_REFRESH_CONCURRENCY'],
+            app.config['CATALOG_REFRESH_MAX_PENDING']
+        )
+        self.limiter = SharedTokenBucket(
+            app.config['UPSTREAM_RATE_LIMIT_PATH'],
+            rate=app.config['UPSTREAM_RATE_LIMIT'],
+            burst=app.config['UPSTREAM_RATE_BURST']
+        )
+        self.rate_max_wait = app.config['UPSTREAM_RATE_MAX_WAIT']
+        self.breaker.configure(
+            app.config['UPSTREAM_BREAKER_ERROR_RATE'],
+            app.config['UPSTREAM_BREAKER_MIN_CALLS'],
+            app.config['UPSTREAM_BREAKER_WINDOW'],
+            app.config['UPSTREAM_BREAKER_COOLDOWN']
+        )
+        app.extensions['tmdb'] = self
+
+    def fetch(self, path, params=None):
+        """Call the upstream API directly, bypassing the cache"""
+        ticket = self.breaker.allow()
+        if ticket is None:
+            raise UpstreamError(f"Upstream circuit open for {path}", status=503)
+        if not self.limiter.acquire(self.rate_max_wait):
+            raise UpstreamError(f"Upstream rate limit reached for {path}", status=429)
+
+        query = normalize_params(params)
+        if self.api_key:
+            query.append(('api_key', self.api_key))
+        url = f"{self.base_url}/{path}?{urllib.parse.urlencode(query)}"
+
+        started = time.perf_counter()
+        try:
+            status, body = upstream.request(url, timeout=self.timeout)
+        except (OSError, http.client.HTTPException) as e:
+            self.breaker.record(True, ticket)
+            raise UpstreamError(f"Upstream unavailable for {path}: {str(e)}") from e
+        finally:
+            with self._lock:
+                self._upstream_calls += 1
+                self._latencies.append(time.perf_counter() - started)
+
+        self.breaker.record(status == 429 or status >= 500, ticket)
+        if status == 429:
+            self.limiter.penalize(RATE_LIMIT_BACKOFF)
+        if status != 200:
+            raise UpstreamError(f"Upstream returned {status} for {path}", status=status)
+        return body
+
+    def _load(self, key, ttl, loader, cross_worker):
+        def load():
+            body = loader()
+            entry_ttl = ttl
+            if isinstance(body, tuple):
+                body, entry_ttl = body
+            self.cache.set(key, body, entry_ttl, self.stale_ttl)
+            return body, None
+
+        def load_locked():
+            with self.locks.hold(key):
+                entry = self.cache.reload(key)
+                if entry is not None and entry[1]:
+                    with self._lock:
+                        self._cross_worker_fills += 1
+                    return entry[0], 'disk'
+                return load()
+
+        return self.flights.do(key, load_locked if cross_worker else load)
+
+    def cached(self, key, ttl, loader, cross_worker=True):
+        """Return ``(body, cache_tier)`` for a key, calling ``loader`` on a miss.
+
+        Concurrent misses for the same key share one load per worker. With
+        ``cross_worker`` the load also takes a host-wide lock and re-checks
+        the disk cache, so only the first worker goes upstream. Composite
+        documents whose loaders call back into ``cached`` must pass False,
+        since the lock stripes are not re-entrant.
+
+        Stale entries are returned immediately (tier ``'stale'``) and queued
+        for a background refresh, unless the upstream circuit is open.
+
+        ``loader`` may return ``(body, ttl)`` to keep a body fresh for less
+        than ``ttl``, e.g. a document assembled with parts missing.
+        """
+        self.refresher.record_hit(key)
+        body, tier, fresh = self.cache.get(key)
+        if body is not None:
+            if fresh:
+                return body, tier
+            if not self.breaker.is_open:
+                self.refresher.schedule(key, lambda: self._load(key, ttl, loader, cross_worker))
+            return body, 'stale'
+
+        return self._load(key, ttl, loader, cross_worker)
+
+    def get(self, path, params=None):
+        """Return ``(body, cache_tier)`` for a catalog path, fetching on a miss"""
+        ttl = ttl_for(path)
+        if ttl is None:
+            raise UpstreamError(f"Path not allowed: {path}", status=404)
+        return self.cached(cache_key(path, params), ttl, lambda: self.fetch(path, params))
+
+    def invalidate(self, path, params=None):
+        self.cache.delete(cache_key(path, params))
+
+    def get_json(self, path, params=None):
+        body, _ = self.get(path, params)
+        return json.loads(body)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            upstream_calls = self._upstream_calls
+            cross_worker_fills = self._cross_worker_fills
+
+        def percentile(p):
+            if not latencies:
+                return None
+            index = min(len(latencies) - 1, int(round(p * (len(latencies) - 1))))
+            return round(latencies[index] * 1000, 2)
+
+        return {
+            'cache': self.cache.stats(),
+            'upstream': {
+                'calls': upstream_calls,
+                'latency_ms_p50': percentile(0.50),
+                'latency_ms_p99': percentile(0.99),
+                'pools': upstream.stats(),
+                'rate_limit': self.limiter.stats(),
+                'breaker': self.breaker.stats(),
+            },
+            'coalescing': {
+                'leaders': self.flights.leaders,
+                'coalesced': self.flights.coalesced,
+                'cross_worker_fills': cross_worker_fills,
+                'in_flight': self.flights.in_flight(),
+            },
+            'refresh': self.refresher.stats(),
+            'pid': os.getpid(),
+        }
+
+
+tmdb = TMDbClient()
@@ -0,0 +1,230 @@
+import http.client
+import os
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+# Idle keep-alive connections older than this are closed rather than reused,
+# since servers drop them on their side after a while
+IDLE_TIMEOUT = 30
+
+_local = threading.local()
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+def current_deadline():
+    return getattr(_local, 'deadline', None)
+
+
+@contextmanager
+def deadline(seconds):
+    """Bound every upstream call this thread makes inside the block"""
+    previous = current_deadline()
+    limit = time.monotonic() + seconds
+    _local.deadline = limit if previous is None else min(previous, limit)
+    try:
+        yield _local.deadline
+    finally:
+        _local.deadline = previous
+
+
+def time_left(timeout):
+    """The socket timeout for the next call, capped by the thread's deadline"""
+    limit = current_deadline()
+    if limit is None:
+        return timeout
+    left = limit - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded('Upstream deadline exceeded')
+    return min(timeout, left)
+
+
+class ConnectionPool:
+    """Keep-alive connections to one host, at most ``max_size`` open at once"""
+
+    def __init__(self, scheme, host, port, max_size):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.max_size = max_size
+        self._idle = []  # (connection, released_at); newest last so warm sockets are reused first
+        self._cond = threading.Condition()
+        self.in_use = 0
+        self.counters = {'created': 0, 'reused': 0, 'discarded': 0, 'acquired': 0, 'waited': 0}
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+
+    def acquire(self, timeout):
+        """Return ``(connection, reused)``, waiting at most ``timeout`` for a free slot"""
+        started = time.monotonic()
+        with self._cond:
+            while not self._idle and self.in_use >= self.max_size:
+                left = timeout - (time.monotonic() - started)
+                if left <= 0:
+                    raise DeadlineExceeded(f'No upstream connection to {self.host} within {timeout:.1f}s')
+                self._cond.wait(left)
+
+            waited = time.monotonic() - started
+            self.counters['acquired'] += 1
+            if waited > 0.001:
+                self.counters['waited'] += 1
+            self.wait_time += waited
+            self.max_wait = max(self.max_wait, waited)
+            self.in_use += 1
+
+            expired = []
+            while self._idle:
+                connection, released_at = self._idle.pop()
+                if time.monotonic() - released_at < IDLE_TIMEOUT:
+                    self.counters['reused'] += 1
+                    break
+                expired.append(connection)
+            else:
+                connection = None
+                self.counters['created'] += 1
+            self.counters['discarded'] += len(expired)
+
+        for stale in expired:
+            stale.close()
+        if connection is not None:
+            return connection, True
+        connection_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        return connection_class(self.host, self.port, timeout=timeout), False
+
+    def release(self, connection, reusable):
+        with self._cond:
+            self.in_use -= 1
+            if reusable:
+                self._idle.append((connection, time.monotonic()))
+            else:
+                self.counters['discarded'] += 1
+            self._cond.notify()
+        if not reusable:
+            connection.close()
+
+    def stats(self):
+        with self._cond:
+            acquired = self.counters['acquired']
+            return dict(
+                self.counters,
+                in_use=self.in_use,
+                idle=len(self._idle),
+                max_size=self.max_size,
+                wait_ms_avg=round(self.wait_time / acquired * 1000, 2) if acquired else None,
+                wait_ms_max=round(self.max_wait * 1000, 2),
+            )
+
+
+class UpstreamClient:
+    """Pooled keep-alive HTTP client shared by every upstream call in a worker"""
+
+    def __init__(self, max_connections=16, concurrency=32, timeout=10):
+        self.max_connections = max_connections
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._pools = {}
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_connections = app.config['UPSTREAM_POOL_SIZE']
+        self.concurrency = app.config['UPSTREAM_CONCURRENCY']
+        self.timeout = app.config['TMDB_TIMEOUT']
+        app.extensions['upstream'] = self
+
+    def _reset_after_fork(self):
+        # Sockets and threads are not shared with forked workers
+        if self._pid != os.getpid():
+            self._pools = {}
+            self._executor = None
+            self._pid = os.getpid()
+
+    def pool(self, scheme, host, port):
+        with self._lock:
+            self._reset_after_fork()
+            key = (scheme, host, port)
+            if key not in self._pools:
+                self._pools[key] = ConnectionPool(scheme, host, port, self.max_connections)
+            return self._pools[key]
+
+    @property
+    def executor(self):
+        with self._lock:
+            self._reset_after_fork()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='upstream')
+            return self._executor
+
+    def request(self, url, timeout=None, headers=None):
+        """GET ``url`` over a pooled connection and return ``(status, body)``"""
+        parts = urllib.parse.urlsplit(url)
+        pool = self.pool(parts.scheme, parts.hostname, parts.port)
+        target = parts.path + (f'?{parts.query}' if parts.query else '')
+
+        for attempt in range(2):
+            call_timeout = time_left(timeout or self.timeout)
+            connection, reused = pool.acquire(call_timeout)
+            try:
+                connection.timeout = call_timeout
+                if connection.sock is not None:
+                    connection.sock.settimeout(call_timeout)
+                connection.request('GET', target, headers=headers or {})
+                response = connection.getresponse()
+                body = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                pool.release(connection, False)
+                # The server closed an idle keep-alive connection; retry once on a new one
+                if reused and attempt == 0:
+                    continue
+                raise
+            except BaseException:
+                pool.release(connection, False)
+                raise
+            pool.release(connection, not response.will_close)
+            return response.status, body
+
+    def gather(self, calls, timeout=None):
+        """Run ``{name: callable}`` concurrently under one deadline.
+
+        Returns ``{name: (result, error)}``. Upstream calls made inside the
+        callables inherit the deadline, and calls still running when it
+        passes report ``DeadlineExceeded``.
+        """
+        limit = time.monotonic() + (timeout or self.timeout)
+        if current_deadline() is not None:
+            limit = min(limit, current_deadline())
+
+        def run(func):
+            _local.deadline = limit
+            try:
+                return func()
+            finally:
+                _local.deadline = None
+
+        futures = {name: self.executor.submit(run, func) for name, func in calls.items()}
+        done, _ = wait(futures.values(), timeout=max(0, limit - time.monotonic()))
+        results = {}
+        for name, future in futures.items():
+            if future not in done:
+                future.cancel()
+                results[name] = (None, DeadlineExceeded(f'{name} did not finish before the deadline'))
+            elif future.exception() is not None:
+                results[name] = (None, future.exception())
+            else:
+                results[name] = (future.result(), None)
+        return results
+
+    def stats(self):
+        with self._lock:
+            pools = dict(self._pools) if self._pid == os.getpid() else {}
+        return {f'{scheme}://{host}' + (f':{port}' if port else ''): pool.stats()
+                for (scheme, host, port), pool in pools.items()}
+
+
+upstream = UpstreamClient()
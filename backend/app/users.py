@@ -0,0 +1,216 @@
+import sqlite3
+import threading
+import time
+from flask import g
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from .cache import LRUCache, SQLiteCache
+from .serializers import PROFILE_SUMMARY
+from .models import User, Profile
+from . import db
+
+
+def _load(condition, with_password=False):
+    """Fetch a user and their profiles in one query as plain rows.
+
+    Returns ``(user_row, profile_rows)`` or ``(None, [])``.
+    """
+    columns = [User.id, User.email, User.subscription_plan]
+    if with_password:
+        columns.append(User.password)
+    rows = db.session.query(
+        *columns,
+        Profile.id.label('profile_id'),
+        Profile.name.label('profile_name'),
+        Profile.avatar_url.label('profile_avatar_url'),
+        Profile.is_kids.label('profile_is_kids'),
+        Profile.created_at.label('profile_created_at'),
+        Profile.updated_at.label('profile_updated_at')
+    ).outerjoin(Profile, Profile.user_id == User.id).filter(condition).order_by(Profile.id).all()
+
+    if not rows:
+        return None, []
+    profiles = [row for row in rows if row.profile_id is not None]
+    return rows[0], profiles
+
+
+def load_user_by_email(email):
+    """The user row includes the password hash, for login"""
+    return _load(User.email == email, with_password=True)
+
+
+def load_user_by_id(user_id):
+    return _load(User.id == user_id)
+
+
+def user_payload(user, profiles):
+    """The ``user`` object returned by register, login and /auth/me"""
+    return {
+        'id': user.id,
+        'email': user.email,
+        'subscription_plan': user.subscription_plan,
+        'profiles': PROFILE_SUMMARY.dump_many(profiles)
+    }
+
+
+class UserPayloadCache:
+    """Per-worker cache of user payloads for /auth/me.
+
+    Writes to a user's profiles or subscription invalidate their entry in
+    this worker; the short TTL bounds how stale other workers can be.
+    """
+
+    def __init__(self, ttl=30, max_entries=4096):
+        self.ttl = ttl
+        self._entries = LRUCache(max_entries)
+
+    def init_app(self, app):
+        self.ttl = app.config['USER_PAYLOAD_TTL']
+
+    def get(self, user_id):
+        """Return the payload for a user, or None if the user does not exist"""
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            return entry[0]
+        user, profiles = load_user_by_id(user_id)
+        if user is None:
+            return None
+        payload = user_payload(user, profiles)
+        self.set(user_id, payload)
+        return payload
+
+    def set(self, user_id, payload):
+        if self.ttl:
+            self._entries.set(user_id, payload, time.time() + self.ttl)
+
+    def invalidate(self, user_id):
+        self._entries.delete(user_id)
+
+
+user_payloads = UserPayloadCache()
+
+
+class ProfileListCache:
+    """Serialized profile lists with their ETags, shared by every worker on the host.
+
+    Entries are invalidated from SQLAlchemy session events whenever a
+    ``Profile`` is inserted, updated or deleted through the ORM and the
+    transaction commits, so handlers need no cache code. Bulk
+    ``query.update()``/``delete()`` on profiles bypass these events.
+    """
+
+    # Longer than any fill takes, so fills that read before a write are refused
+    INVALIDATION_HOLD = 60
+
+    def __init__(self):
+        self.ttl = 300
+        self._store = None
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'fills': 0, 'fills_refused': 0, 'invalidations': 0}
+
+    def init_app(self, app):
+        self.ttl = app.config['PROFILE_LIST_TTL']
+        self._store = SQLiteCache(app.config['PROFILE_LIST_CACHE_PATH'])
+        if not event.contains(Session, 'after_flush', _collect_profile_owners):
+            event.listen(Session, 'after_flush', _collect_profile_owners)
+            event.listen(Session, 'after_commit', _invalidate_profile_owners)
+            event.listen(Session, 'after_soft_rollback', _discard_profile_owners)
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def get(self, user_id):
+        """Return ``(etag, body)`` or None"""
+        if not self.ttl:
+            return None
+        try:
+            entry = self._store.get(f'profiles:{user_id}')
+        except sqlite3.Error as e:
+            print(f"Profile list cache read error: {str(e)}")
+            entry = None
+        if entry is None or not entry[0][0]:
+            self._count('misses')
+            return None
+        self._count('hits')
+        etag, _, body = entry[0][0].partition(b'\n')
+        return etag.decode(), body
+
+    def fill(self, user_id, etag, body, started_at):
+        """Store a list read after ``started_at``"""
+        if not self.ttl:
+            return
+        expires_at = time.time() + self.ttl
+        try:
+            stored = self._store.fill(
+                f'profiles:{user_id}', (etag.encode() + b'\n' + body, expires_at), expires_at, started_at)
+        except sqlite3.Error as e:
+            print(f"Profile list cache write error: {str(e)}")
+            return
+        self._count('fills' if stored else 'fills_refused')
+
+    def invalidate(self, user_id):
+        if self._store is None:
+            return
+        try:
+            self._store.invalidate(f'profiles:{user_id}', self.INVALIDATION_HOLD)
+        except sqlite3.Error as e:
+            print(f"Profile list cache invalidation error: {str(e)}")
+            return
+        self._count('invalidations')
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        lookups = counters['hits'] + counters['misses']
+        counters['hit_ratio'] = round(counters['hits'] / lookups, 4) if lookups else 0.0
+        return counters
+
+
+profile_lists = ProfileListCache()
+
+
+def _collect_profile_owners(session, flush_context):
+    owners = session.info.setdefault('profile_owners', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Profile):
+            # Old and new owner alike, without loading anything mid-flush
+            owners.update(user_id for user_id in inspect(obj).attrs.user_id.history.sum() if user_id is not None)
+
+
+def _invalidate_profile_owners(session):
+    for user_id in session.info.pop('profile_owners', ()):
+        profile_lists.invalidate(user_id)
+
+
+def _discard_profile_owners(session, previous_transaction):
+    session.info.pop('profile_owners', None)
+
+
+class Identity:
+    """The authenticated user and their profiles, as loaded for one request"""
+
+    def __init__(self, user, profiles):
+        self.user_id = user.id
+        self.subscription_plan = user.subscription_plan
+        self.profiles = {row.profile_id: row for row in profiles}
+
+    def owns_profile(self, profile_id):
+        return profile_id in self.profiles
+
+    def profile(self, profile_id):
+        return self.profiles.get(profile_id)
+
+
+def current_identity():
+    """The identity for the token's user, loaded once per request and kept on ``g``.
+
+    Returns None when the user no longer exists.
+    """
+    if 'identity' not in g:
+        user, profiles = load_user_by_id(g.claims['sub'])
+        g.identity = Identity(user, profiles) if user is not None else None
+        if user is not None:
+            # Same rows /auth/me would load, so refresh its entry for free
+            user_payloads.set(user.id, user_payload(user, profiles))
+    return g.identity
@@ -0,0 +1,63 @@
+from flask import current_app, request
+from sqlalchemy.dialects import postgresql, sqlite
+from .models import ResourceVersion
+from . import db
+
+
+def dialect_insert(model):
+    """INSERT supporting ``on_conflict_do_*`` for the configured database"""
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    return dialect.insert(model)
+
+
+class ResourceVersions:
+    """Version counters for per-user resources, used as ETags.
+
+    Writes bump the counter in the same transaction as the change, so a
+    conditional GET is answered from one primary-key lookup without
+    loading or serializing the resource.
+    """
+
+    def get(self, key):
+        version = db.session.query(ResourceVersion.version).filter_by(key=key).scalar()
+        return version or 0
+
+    def bump(self, *keys):
+        """Increment counters; call before the write's commit"""
+        for key in keys:
+            statement = dialect_insert(ResourceVersion).values(key=key, version=1)
+            db.session.execute(statement.on_conflict_do_update(
+                index_elements=[ResourceVersion.key],
+                set_={'version': ResourceVersion.version + 1}
+            ))
+
+    def etag(self, key):
+        return f'{key}.v{self.get(key)}'
+
+    def matches(self, etag):
+        """True when the client already has this version"""
+        return etag in request.if_none_match
+
+    def not_modified(self, etag):
+        return self.tag(current_app.response_class(status=304), etag)
+
+    def tag(self, response, etag):
+        response.set_etag(etag)
+        # Cached copies must be revalidated before use
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+def profiles_key(user_id):
+    return f'profiles:{user_id}'
+
+
+def watchlist_key(profile_id):
+    return f'watchlist:{profile_id}'
+
+
+def history_key(profile_id):
+    return f'history:{profile_id}'
+
+
+versions = ResourceVersions()
@@ -0,0 +1,44 @@
+from datetime import datetime, timezone
+from .models import WatchlistItem
+from .serializers import WATCHLIST_ITEM
+from .versions import dialect_insert, versions, watchlist_key
+from . import db
+
+
+def add_item(profile_id, movie_id, movie_title='', movie_poster='', movie_type='movie'):
+    """Add a title in one INSERT ... ON CONFLICT DO NOTHING and commit.
+
+    Returns the new item's row, or None when the title was already on the
+    watchlist. The unique (profile_id, movie_id) index makes concurrent
+    adds of the same title insert exactly one row.
+    """
+    statement = dialect_insert(WatchlistItem).values(
+        profile_id=profile_id,
+        movie_id=movie_id,
+        movie_title=movie_title,
+        movie_poster=movie_poster,
+        movie_type=movie_type,
+        added_at=datetime.now(tz=timezone.utc)
+    ).on_conflict_do_nothing(
+        index_elements=[WatchlistItem.profile_id, WatchlistItem.movie_id]
+    ).returning(*WATCHLIST_ITEM.columns(WatchlistItem))
+
+    row = db.session.execute(statement).first()
+    if row is not None:
+        versions.bump(watchlist_key(profile_id))
+    db.session.commit()
+    return row
+
+
+def remove_item(profile_id, movie_id):
+    """Remove a title in one DELETE and commit; returns whether it was on the watchlist"""
+    removed = db.session.execute(
+        WatchlistItem.__table__.delete().where(
+            WatchlistItem.profile_id == profile_id,
+            WatchlistItem.movie_id == movie_id
+        )
+    ).rowcount > 0
+    if removed:
+        versions.bump(watchlist_key(profile_id))
+    db.session.commit()
+    return removed
@@ -0,0 +1,134 @@
+"""Per-item cost of building and encoding watchlist and history responses.
+
+Compares the hand-built dicts the routes used to return over ORM objects
+with the compiled schemas in app/serializers.py over plain rows, and the
+stdlib JSON provider with orjson. Runs against a throwaway in-memory
+database.
+
+    $ python bench_serializers.py --items 100,1000,10000
+"""
+import argparse
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+SCRATCH = tempfile.mkdtemp(prefix='bench-serializers-')
+atexit.register(shutil.rmtree, SCRATCH, True)
+os.environ['DATABASE_URL'] = 'sqlite://'
+for name, filename in [('CATALOG_CACHE_PATH', 'catalog.db'), ('UPSTREAM_RATE_LIMIT_PATH', 'rate.db'),
+                       ('THROTTLE_TABLE_PATH', 'throttle.bin'), ('IMAGE_CACHE_DIR', 'images')]:
+    os.environ.setdefault(name, os.path.join(SCRATCH, filename))
+os.environ.setdefault('SECRET_KEY', 'bench')
+
+from flask.json.provider import DefaultJSONProvider
+from app import create_app, db
+from app.models import User, Profile, WatchlistItem, ViewingHistory
+from app.serializers import WATCHLIST_ITEM, HISTORY_ITEM, OrjsonProvider, orjson
+
+
+def seed(count):
+    db.drop_all()
+    db.create_all()
+    user = User('bench@example.com', 'x')
+    db.session.add(user)
+    db.session.flush()
+    profile = Profile(user_id=user.id, name='Bench')
+    db.session.add(profile)
+    db.session.flush()
+    now = datetime.now(tz=timezone.utc)
+    db.session.execute(WatchlistItem.__table__.insert(), [{
+        'profile_id': profile.id, 'movie_id': str(100000 + i), 'movie_title': f'Title {i}',
+        'movie_poster': f'/poster{i}.jpg', 'movie_type': 'movie', 'added_at': now - timedelta(minutes=i)
+    } for i in range(count)])
+    db.session.execute(ViewingHistory.__table__.insert(), [{
+        'profile_id': profile.id, 'movie_id': str(100000 + i), 'movie_title': f'Title {i}',
+        'movie_poster': f'/poster{i}.jpg', 'movie_type': 'tv', 'watched_at': now - timedelta(minutes=i),
+        'progress_percent': i % 100 / 100
+    } for i in range(count)])
+    db.session.commit()
+    return profile.id
+
+
+def watchlist_by_hand(profile_id):
+    return [{
+        'id': item.id,
+        'movie_id': item.movie_id,
+        'movie_title': item.movie_title,
+        'movie_poster': item.movie_poster,
+        'movie_type': item.movie_type,
+        'added_at': item.added_at.isoformat() if item.added_at else None
+    } for item in WatchlistItem.query.filter_by(profile_id=profile_id).all()]
+
+
+def watchlist_by_schema(profile_id):
+    rows = db.session.query(*WATCHLIST_ITEM.columns(WatchlistItem)).filter(
+        WatchlistItem.profile_id == profile_id).all()
+    return WATCHLIST_ITEM.dump_many(rows)
+
+
+def history_by_hand(profile_id):
+    return [{
+        'id': item.id,
+        'movie_id': item.movie_id,
+        'movie_title': item.movie_title,
+        'movie_poster': item.movie_poster,
+        'movie_type': item.movie_type,
+        'watched_at': item.watched_at.isoformat() if item.watched_at else None,
+        'progress_percent': item.progress_percent
+    } for item in ViewingHistory.query.filter_by(profile_id=profile_id).order_by(
+        ViewingHistory.watched_at.desc()).all()]
+
+
+def history_by_schema(profile_id):
+    rows = db.session.query(*HISTORY_ITEM.columns(ViewingHistory)).filter(
+        ViewingHistory.profile_id == profile_id).order_by(ViewingHistory.watched_at.desc()).all()
+    return HISTORY_ITEM.dump_many(rows)
+
+
+def per_item_us(func, count, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', default='100,1000,10000', help='Comma-separated list sizes.')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement; the best is reported.')
+    args = parser.parse_args()
+
+    app = create_app()
+    providers = [('json', DefaultJSONProvider(app))]
+    if orjson is not None:
+        providers.append(('orjson', OrjsonProvider(app)))
+    else:
+        print('orjson is not installed; only the stdlib provider is measured')
+
+    print(f"{'list':<10}{'items':>7}{'hand+ORM':>11}{'schema+rows':>13}"
+          + ''.join(f'{f"encode {name}":>15}' for name, _ in providers) + '   (microseconds per item)')
+    with app.app_context():
+        for count in [int(size) for size in args.items.split(',')]:
+            profile_id = seed(count)
+            for label, by_hand, by_schema in [('watchlist', watchlist_by_hand, watchlist_by_schema),
+                                              ('history', history_by_hand, history_by_schema)]:
+                assert by_hand(profile_id) == by_schema(profile_id)
+                payload = by_schema(profile_id)
+                timings = [
+                    per_item_us(lambda: by_hand(profile_id), count, args.repeat),
+                    per_item_us(lambda: by_schema(profile_id), count, args.repeat),
+                ] + [per_item_us(lambda: provider.dumps(payload), count, args.repeat) for _, provider in providers]
+                print(f'{label:<10}{count:>7}{timings[0]:>11.2f}{timings[1]:>13.2f}'
+                      + ''.join(f'{timing:>15.2f}' for timing in timings[2:]))
+
+
+if __name__ == '__main__':
+    main()
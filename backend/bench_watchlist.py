@@ -0,0 +1,159 @@
+"""Hammer one (profile, title) watchlist pair from many threads.
+
+Compares the old check-then-insert with the single-statement
+INSERT ... ON CONFLICT DO NOTHING and DELETE in app/watchlist.py.
+Reports throughput, latency, errors and whether the row count agrees
+with what each call said it changed. Uses a throwaway SQLite file unless
+--database points elsewhere (e.g. a scratch Postgres database).
+
+    $ python bench_watchlist.py --threads 16 --ops 200
+"""
+import argparse
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import warnings
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+SCRATCH = tempfile.mkdtemp(prefix='bench-watchlist-')
+atexit.register(shutil.rmtree, SCRATCH, True)
+for name, filename in [('CATALOG_CACHE_PATH', 'catalog.db'), ('UPSTREAM_RATE_LIMIT_PATH', 'rate.db'),
+                       ('THROTTLE_TABLE_PATH', 'throttle.bin'), ('PROFILE_LIST_CACHE_PATH', 'profile_list_cache.db'),
+                       ('IMAGE_CACHE_DIR', 'images')]:
+    os.environ.setdefault(name, os.path.join(SCRATCH, filename))
+os.environ.setdefault('SECRET_KEY', 'bench')
+
+MOVIE_ID = '550'
+
+
+def legacy_add(profile_id):
+    """What add_to_watchlist did before: look, then insert"""
+    from app import db
+    from app.models import WatchlistItem
+    if WatchlistItem.query.filter_by(profile_id=profile_id, movie_id=MOVIE_ID).first():
+        return False
+    db.session.add(WatchlistItem(profile_id=profile_id, movie_id=MOVIE_ID, movie_title='Fight Club'))
+    db.session.commit()
+    return True
+
+
+def legacy_remove(profile_id):
+    from app import db
+    from app.models import WatchlistItem
+    item = WatchlistItem.query.filter_by(profile_id=profile_id, movie_id=MOVIE_ID).first()
+    if not item:
+        return False
+    db.session.delete(item)
+    db.session.commit()
+    return True
+
+
+def atomic_add(profile_id):
+    from app.watchlist import add_item
+    return add_item(profile_id, MOVIE_ID, movie_title='Fight Club') is not None
+
+
+def atomic_remove(profile_id):
+    from app.watchlist import remove_item
+    return remove_item(profile_id, MOVIE_ID)
+
+
+def run(app, profile_id, operations, threads, ops):
+    """Each thread runs ``ops`` calls cycling through ``operations``"""
+    from app import db
+    start_gate = threading.Barrier(threads)
+    lock = threading.Lock()
+    results = {'changed': {}, 'errors': {}, 'latencies': []}
+
+    def worker():
+        latencies, changed, errors = [], {}, {}
+        with app.app_context():
+            start_gate.wait()
+            for i in range(ops):
+                name, operation = operations[i % len(operations)]
+                began = time.perf_counter()
+                try:
+                    if operation(profile_id):
+                        changed[name] = changed.get(name, 0) + 1
+                except Exception as e:
+                    db.session.rollback()
+                    kind = type(e.orig if hasattr(e, 'orig') else e).__name__
+                    errors[kind] = errors.get(kind, 0) + 1
+                latencies.append(time.perf_counter() - began)
+            db.session.remove()
+        with lock:
+            results['latencies'].extend(latencies)
+            for name, count in changed.items():
+                results['changed'][name] = results['changed'].get(name, 0) + count
+            for kind, count in errors.items():
+                results['errors'][kind] = results['errors'].get(kind, 0) + count
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    began = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results['elapsed'] = time.perf_counter() - began
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--ops', type=int, default=200, help='Calls per thread and scenario.')
+    parser.add_argument('--database', default=f"sqlite:///{os.path.join(SCRATCH, 'bench.db')}",
+                        help='SQLAlchemy URL of a scratch database; its tables are dropped.')
+    args = parser.parse_args()
+    os.environ['DATABASE_URL'] = args.database
+
+    from sqlalchemy import func
+    from sqlalchemy.exc import SAWarning
+    from app import create_app, db
+    from app.models import User, Profile, WatchlistItem
+
+    app = create_app()
+    # The legacy remove warns when another thread deleted the row first; the table shows it
+    warnings.simplefilter('ignore', SAWarning)
+    scenarios = [
+        ('legacy add', [('add', legacy_add)]),
+        ('atomic add', [('add', atomic_add)]),
+        ('legacy toggle', [('add', legacy_add), ('remove', legacy_remove)]),
+        ('atomic toggle', [('add', atomic_add), ('remove', atomic_remove)]),
+    ]
+    with app.app_context():
+        print(f'{args.threads} threads x {args.ops} calls on one pair ({db.engine.dialect.name})')
+        print(f"{'scenario':<15}{'ops/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'added':>7}{'removed':>9}{'rows':>6}  "
+              f"{'consistent':<11}errors")
+        for label, operations in scenarios:
+            db.drop_all()
+            db.create_all()
+            user = User('bench@example.com', 'x')
+            db.session.add(user)
+            db.session.flush()
+            profile = Profile(user_id=user.id, name='Bench')
+            db.session.add(profile)
+            db.session.commit()
+            profile_id = profile.id
+
+            results = run(app, profile_id, operations, args.threads, args.ops)
+            rows = db.session.query(func.count(WatchlistItem.id)).filter_by(
+                profile_id=profile_id, movie_id=MOVIE_ID).scalar()
+            added = results['changed'].get('add', 0)
+            removed = results['changed'].get('remove', 0)
+            latencies = sorted(results['latencies'])
+            p50 = latencies[len(latencies) // 2] * 1000
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+            consistent = added - removed == rows and rows <= 1
+            errors = ', '.join(f'{kind}={count}' for kind, count in sorted(results['errors'].items())) or '-'
+            print(f'{label:<15}{len(latencies) / results["elapsed"]:>9.0f}{p50:>9.2f}{p99:>9.2f}'
+                  f'{added:>7}{removed:>9}{rows:>6}  {"yes" if consistent else "NO":<11}{errors}')
+            db.session.remove()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""Unique index on watchlist_item (profile_id, movie_id)
+
+Databases created with db.create_all() before this index existed are the
+baseline; newer ones already have it from the model and are left alone.
+
+Revision ID: 6993410d3c97
+Revises: b08f95e3d45c
+Create Date: 2026-10-18 10:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6993410d3c97'
+down_revision = 'b08f95e3d45c'
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = 'uq_watchlist_item_profile_id_movie_id'
+
+
+def upgrade():
+    indexes = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('watchlist_item')}
+    if INDEX_NAME in indexes:
+        return
+    # Duplicates left by the old check-then-insert; keep the first of each
+    op.execute(
+        'DELETE FROM watchlist_item WHERE id NOT IN ('
+        'SELECT MIN(id) FROM watchlist_item GROUP BY profile_id, movie_id)'
+    )
+    op.create_index(INDEX_NAME, 'watchlist_item', ['profile_id', 'movie_id'], unique=True)
+
+
+def downgrade():
+    op.drop_index(INDEX_NAME, table_name='watchlist_item')
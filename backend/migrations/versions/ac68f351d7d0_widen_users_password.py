@@ -0,0 +1,34 @@
+"""Widen users.password to 255 characters for salted hashes
+
+Databases created with db.create_all() before the hasher change have
+VARCHAR(100), too short for the encoded hashes on strict backends.
+
+Revision ID: ac68f351d7d0
+Revises:
+Create Date: 2026-10-18 10:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ac68f351d7d0'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = {column['name']: column for column in sa.inspect(op.get_bind()).get_columns('users')}
+    if (getattr(columns['password']['type'], 'length', None) or 255) >= 255:
+        return
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.alter_column('password', existing_type=sa.String(length=100),
+                              type_=sa.String(length=255), existing_nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.alter_column('password', existing_type=sa.String(length=255),
+                              type_=sa.String(length=100), existing_nullable=False)
@@ -0,0 +1,107 @@
+"""Tables for resource versions, revoked tokens and the title indexes
+
+Adds resource_version, revoked_token, title_eligibility,
+title_certification, home_row and catalog_title. Tables that
+db.create_all() already made are left alone.
+
+Revision ID: b08f95e3d45c
+Revises: ac68f351d7d0
+Create Date: 2026-10-18 10:50:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b08f95e3d45c'
+down_revision = 'ac68f351d7d0'
+branch_labels = None
+depends_on = None
+
+TABLES = ['resource_version', 'revoked_token', 'title_eligibility', 'title_certification', 'home_row',
+          'catalog_title']
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'resource_version' not in existing:
+        op.create_table(
+            'resource_version',
+            sa.Column('key', sa.String(length=64), nullable=False),
+            sa.Column('version', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('key'),
+        )
+
+    if 'revoked_token' not in existing:
+        op.create_table(
+            'revoked_token',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('jti', sa.String(length=32), nullable=False),
+            sa.Column('expires_at', sa.DateTime(), nullable=False),
+            sa.Column('revoked_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('jti'),
+        )
+        op.create_index('ix_revoked_token_expires_at', 'revoked_token', ['expires_at'])
+
+    if 'title_eligibility' not in existing:
+        op.create_table(
+            'title_eligibility',
+            sa.Column('media_type', sa.String(length=10), nullable=False),
+            sa.Column('tmdb_id', sa.Integer(), nullable=False),
+            sa.Column('has_trailer', sa.Boolean(), nullable=False),
+            sa.Column('has_logo', sa.Boolean(), nullable=False),
+            sa.Column('checked_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('media_type', 'tmdb_id'),
+        )
+        op.create_index('ix_title_eligibility_checked_at', 'title_eligibility', ['checked_at'])
+
+    if 'title_certification' not in existing:
+        op.create_table(
+            'title_certification',
+            sa.Column('media_type', sa.String(length=10), nullable=False),
+            sa.Column('tmdb_id', sa.Integer(), nullable=False),
+            sa.Column('region', sa.String(length=2), nullable=False),
+            sa.Column('certification', sa.String(length=20), nullable=False),
+            sa.Column('checked_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('media_type', 'tmdb_id', 'region'),
+        )
+        op.create_index('ix_title_certification_checked_at', 'title_certification', ['checked_at'])
+
+    if 'home_row' not in existing:
+        op.create_table(
+            'home_row',
+            sa.Column('row_key', sa.String(length=50), nullable=False),
+            sa.Column('language', sa.String(length=10), nullable=False),
+            sa.Column('position', sa.Integer(), nullable=False),
+            sa.Column('payload', sa.Text(), nullable=False),
+            sa.Column('built_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('row_key', 'language'),
+        )
+
+    if 'catalog_title' not in existing:
+        # The FTS index over it is created by the mirror on first ingest
+        op.create_table(
+            'catalog_title',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('media_type', sa.String(length=10), nullable=False),
+            sa.Column('tmdb_id', sa.Integer(), nullable=False),
+            sa.Column('title', sa.String(length=300), nullable=False),
+            sa.Column('original_title', sa.String(length=300), nullable=True),
+            sa.Column('overview', sa.Text(), nullable=True),
+            sa.Column('popularity', sa.Float(), nullable=True),
+            sa.Column('data', sa.Text(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('media_type', 'tmdb_id', name='uq_catalog_title_media_type_tmdb_id'),
+        )
+
+
+def downgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    if 'catalog_title_fts' in existing:
+        op.execute('DROP TABLE catalog_title_fts')
+    for table in reversed(TABLES):
+        if table in existing:
+            op.drop_table(table)
@@ -0,0 +1,71 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app_env():
+    """Extra environment for create_app; override in a test module to change settings"""
+    return {}
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch, app_env):
+    """An app on a throwaway SQLite database, with every cache and table file under tmp_path"""
+    env = {
+        'SECRET_KEY': 'test-secret',
+        'DATABASE_URL': f"sqlite:///{tmp_path / 'app.db'}",
+        'CATALOG_CACHE_PATH': str(tmp_path / 'catalog_cache.db'),
+        'UPSTREAM_RATE_LIMIT_PATH': str(tmp_path / 'upstream_rate.db'),
+        'THROTTLE_TABLE_PATH': str(tmp_path / 'throttle.bin'),
+        'PROFILE_LIST_CACHE_PATH': str(tmp_path / 'profile_list_cache.db'),
+        'IMAGE_CACHE_DIR': str(tmp_path / 'images'),
+        'PASSWORD_HASH_WORKERS': '0',
+        'CATALOG_SCHEDULER_ENABLED': '0',
+    }
+    env.update(app_env)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+
+    from app import create_app, db
+    flask_app = create_app()
+    flask_app.config['TESTING'] = True
+    with flask_app.app_context():
+        db.create_all()
+    yield flask_app
+    with flask_app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def signup(client):
+    """Register a user; returns ``(token, user_id)``"""
+    def register(email='viewer@example.com', password='correct horse'):
+        response = client.post('/api/auth/register', json={'email': email, 'password': password})
+        assert response.status_code == 201, response.get_json()
+        body = response.get_json()
+        return body['access_token'], body['user']['id']
+    return register
+
+
+@pytest.fixture
+def new_profile(client):
+    """Create a profile for the token's user; returns its id"""
+    def create(token, name='Main'):
+        response = client.post('/api/profiles', json={'name': name}, headers=bearer(token))
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()['id']
+    return create
+
+
+def bearer(token):
+    return {'Authorization': f'Bearer {token}'}
@@ -0,0 +1,82 @@
+import time
+
+from app.auth import issue_token, verify_token
+
+from conftest import bearer
+
+
+def test_issued_token_verifies_with_its_claims(app):
+    with app.app_context():
+        token = issue_token(7, 'premium')
+        claims = verify_token(token)
+    assert claims['sub'] == 7
+    assert claims['plan'] == 'premium'
+    assert claims['exp'] > time.time()
+    assert len(claims['jti']) == 16
+
+
+def test_tampered_payload_is_rejected(app):
+    with app.app_context():
+        prefix, _, signature = issue_token(7, 'basic').split('.')
+        _, other_payload, _ = issue_token(8, 'premium').split('.')
+        assert verify_token(f'{prefix}.{other_payload}.{signature}') is None
+
+
+def test_token_signed_with_another_key_is_rejected(app):
+    with app.app_context():
+        token = issue_token(7, 'basic')
+        app.config['SECRET_KEY'] = 'another-secret'
+        assert verify_token(token) is None
+
+
+def test_malformed_tokens_are_rejected(app):
+    with app.app_context():
+        payload = issue_token(7, 'basic').split('.')[1]
+        for token in ['', 'x', 'a.b', 'a.b.c.d', f'ss1.{payload}.é', f'ss2.{payload}.sig', 'ss1.é.é']:
+            assert verify_token(token) is None
+
+
+def test_expired_token_is_rejected(app):
+    with app.app_context():
+        assert verify_token(issue_token(7, 'basic', ttl=-1)) is None
+
+
+def test_require_auth_needs_a_bearer_token(client):
+    assert client.get('/api/auth/me').status_code == 401
+    assert client.get('/api/auth/me', headers={'Authorization': 'Token abc'}).status_code == 401
+    assert client.get('/api/auth/me', headers=bearer('ss1.abc.é')).status_code == 401
+
+
+def test_require_auth_rejects_expired_token(app, client, signup):
+    _, user_id = signup()
+    with app.app_context():
+        expired = issue_token(user_id, 'basic', ttl=-1)
+    response = client.get('/api/auth/me', headers=bearer(expired))
+    assert response.status_code == 401
+    assert response.get_json()['error'] == 'Invalid or expired token'
+
+
+def test_register_and_login_tokens_are_accepted(client, signup):
+    token, user_id = signup('login@example.com', 'secret pass')
+    assert client.get('/api/auth/me', headers=bearer(token)).status_code == 200
+
+    response = client.post('/api/auth/login', json={'email': 'login@example.com', 'password': 'secret pass'})
+    assert response.status_code == 200
+    login_token = response.get_json()['access_token']
+    me = client.get('/api/auth/me', headers=bearer(login_token))
+    assert me.status_code == 200
+    assert me.get_json()['user']['id'] == user_id
+
+
+def test_wrong_password_gets_no_token(client, signup):
+    signup('login@example.com', 'secret pass')
+    response = client.post('/api/auth/login', json={'email': 'login@example.com', 'password': 'wrong'})
+    assert response.status_code in (400, 401)
+    assert 'access_token' not in response.get_json()
+
+
+def test_profile_can_be_created_with_string_user_id(client, signup):
+    token, user_id = signup()
+    response = client.post('/api/profiles', json={'user_id': str(user_id), 'name': 'Kids'}, headers=bearer(token))
+    assert response.status_code == 201
+    assert response.get_json()['user_id'] == user_id
@@ -0,0 +1,72 @@
+import time
+
+from app.breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+
+
+def tripped(cooldown=0.05):
+    breaker = CircuitBreaker(error_rate=0.5, min_calls=4, window=30, cooldown=cooldown)
+    for _ in range(4):
+        breaker.record(True, breaker.allow())
+    assert breaker.state == OPEN
+    return breaker
+
+
+def test_opens_when_errors_spike_and_short_circuits():
+    breaker = tripped(cooldown=60)
+    assert breaker.allow() is None
+    assert breaker.stats()['short_circuited'] == 1
+
+
+def test_stays_closed_below_the_error_rate():
+    breaker = CircuitBreaker(error_rate=0.5, min_calls=4, window=30, cooldown=60)
+    for failed in [True, False, False, False, True, False]:
+        breaker.record(failed, breaker.allow())
+    assert breaker.state == CLOSED
+
+
+def test_probe_success_closes_the_circuit():
+    breaker = tripped()
+    time.sleep(0.06)
+    probe = breaker.allow()
+    assert probe
+    assert breaker.state == HALF_OPEN
+    # Only one probe at a time
+    assert breaker.allow() is None
+    breaker.record(False, probe)
+    assert breaker.state == CLOSED
+
+
+def test_probe_failure_reopens_the_circuit():
+    breaker = tripped()
+    time.sleep(0.06)
+    breaker.record(True, breaker.allow())
+    assert breaker.state == OPEN
+    assert breaker.allow() is None
+
+
+def test_calls_started_before_the_circuit_opened_cannot_close_it():
+    breaker = CircuitBreaker(error_rate=0.5, min_calls=4, window=30, cooldown=0.05)
+    slow_call = breaker.allow()
+    for _ in range(4):
+        breaker.record(True, breaker.allow())
+    time.sleep(0.06)
+    probe = breaker.allow()
+
+    breaker.record(False, slow_call)
+    assert breaker.state == HALF_OPEN
+    breaker.record(True, probe)
+    assert breaker.state == OPEN
+
+
+def test_replaced_probe_cannot_close_the_circuit():
+    breaker = tripped()
+    time.sleep(0.06)
+    lost_probe = breaker.allow()
+    time.sleep(0.06)
+    probe = breaker.allow()
+    assert probe and probe != lost_probe
+
+    breaker.record(False, lost_probe)
+    assert breaker.state == HALF_OPEN
+    breaker.record(False, probe)
+    assert breaker.state == CLOSED
@@ -0,0 +1,154 @@
+import threading
+
+import pytest
+
+from app.home_rows import build_home_rows, home_rows
+from app.models import HomeRow
+from app.upstream import upstream, DeadlineExceeded
+from tmdb_standin import StandIn
+
+
+@pytest.fixture(scope='module')
+def standin():
+    server = StandIn(port=0, fixtures=None, seed=1)
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def app_env(standin):
+    standin.reset_stats()
+    return {
+        'TMDB_BASE_URL': standin.base_url,
+        'TMDB_IMAGE_BASE_URL': standin.image_base_url,
+        'TMDB_API_KEY': 'test',
+        'UPSTREAM_RATE_LIMIT': '0',
+        'IMAGE_WORKERS': '1',
+    }
+
+
+def upstream_requests(standin):
+    return standin.stats['requests']
+
+
+def test_proxy_serves_repeat_requests_from_cache(client, standin):
+    first = client.get('/api/catalog/trending/all/week')
+    assert first.status_code == 200
+    assert len(first.get_json()['results']) == 20
+    assert upstream_requests(standin) == 1
+
+    second = client.get('/api/catalog/trending/all/week')
+    assert second.status_code == 200
+    assert second.get_json() == first.get_json()
+    assert upstream_requests(standin) == 1
+
+
+def test_proxy_refuses_unknown_paths(client, standin):
+    assert client.get('/api/catalog/account/1').status_code == 404
+    assert upstream_requests(standin) == 0
+
+
+def test_title_document_combines_every_part(client):
+    response = client.get('/api/catalog/title/movie/550')
+    assert response.status_code == 200
+    document = response.get_json()
+    assert document['type'] == 'movie'
+    assert document['id'] == 550
+    assert document['details']['id'] == 550
+    assert len(document['credits']['cast']) == 10
+    assert len(document['similar']) == 20
+    assert set(document) >= {'certification', 'trailer', 'logo'}
+
+
+def test_title_details_past_the_deadline_answer_504(client, monkeypatch):
+    request = upstream.request
+
+    def slow_details(url, timeout=None, headers=None):
+        if '/movie/551?' in url:
+            raise DeadlineExceeded('Upstream deadline exceeded')
+        return request(url, timeout=timeout, headers=headers)
+
+    monkeypatch.setattr(upstream, 'request', slow_details)
+    assert client.get('/api/catalog/title/movie/551').status_code == 504
+
+
+def test_title_document_rejects_unknown_types(client):
+    assert client.get('/api/catalog/title/person/1').status_code == 400
+
+
+def test_search_pages_through_movies_and_tv(client):
+    first = client.get('/api/catalog/search?q=shark')
+    assert first.status_code == 200
+    page = first.get_json()
+    assert page['results']
+    assert {item['media_type'] for item in page['results']} <= {'movie', 'tv'}
+
+    if page['hasNextPage']:
+        second = client.get('/api/catalog/search', query_string={'q': 'shark', 'cursor': page['nextCursor']})
+        assert second.status_code == 200
+        seen = {(item['media_type'], item['id']) for item in page['results']}
+        assert not seen & {(item['media_type'], item['id']) for item in second.get_json()['results']}
+
+    assert client.get('/api/catalog/search?q=shark&cursor=not-a-cursor').status_code == 400
+
+
+def test_eligibility_batch(client):
+    response = client.post('/api/catalog/eligibility', json={'titles': [
+        {'type': 'movie', 'id': 550}, {'type': 'tv', 'id': 1399}, {'type': 'movie', 'id': 550}]})
+    assert response.status_code == 200
+    titles = response.get_json()['titles']
+    assert [(title['type'], title['id']) for title in titles] == [('movie', 550), ('tv', 1399)]
+    assert all(isinstance(title['has_trailer'], bool) for title in titles)
+
+    bad = client.post('/api/catalog/eligibility', json={'titles': [{'type': 'person', 'id': 1}]})
+    assert bad.status_code == 400
+
+
+def test_home_rows_are_served_once_built(app, client):
+    home_rows._documents.clear()
+    assert client.get('/api/catalog/home').status_code == 503
+
+    with app.app_context():
+        assert build_home_rows('en-US') == 8
+    response = client.get('/api/catalog/home')
+    assert response.status_code == 200
+    rows = response.get_json()['rows']
+    assert [row['key'] for row in rows][:3] == ['originals', 'trending', 'top_rated']
+    assert all('certification' in item for row in rows for item in row['results'])
+
+
+def test_image_proxy_resizes_originals(client, standin):
+    response = client.get('/api/images/w92/poster550.jpg?format=jpeg')
+    assert response.status_code == 200
+    assert response.mimetype == 'image/jpeg'
+    assert client.get('/api/images/w92/logo550.svg').status_code == 404
+
+
+def test_upstream_errors_become_bad_gateway(client, standin):
+    standin.error_rate = 1.0
+    try:
+        response = client.get('/api/catalog/movie/top_rated')
+    finally:
+        standin.error_rate = 0.0
+    assert response.status_code == 502
+
+
+def test_concurrent_home_row_builds_do_not_collide(app, client):
+    errors = []
+
+    def build():
+        with app.app_context():
+            try:
+                build_home_rows('en-US')
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=build) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    with app.app_context():
+        assert HomeRow.query.filter_by(language='en-US').count() == 8
@@ -0,0 +1,105 @@
+from app import db
+from app.versions import versions
+
+from conftest import bearer
+
+
+def get(client, url, token, etag=None):
+    headers = bearer(token)
+    if etag:
+        headers['If-None-Match'] = f'"{etag}"'
+    return client.get(url, headers=headers)
+
+
+def etag_of(response):
+    return response.get_etag()[0]
+
+
+def test_version_counters_bump_once_per_call(app):
+    with app.app_context():
+        assert versions.get('watchlist:1') == 0
+        versions.bump('watchlist:1')
+        versions.bump('watchlist:1', 'history:1')
+        db.session.commit()
+        assert versions.get('watchlist:1') == 2
+        assert versions.get('history:1') == 1
+        assert versions.etag('watchlist:1') == 'watchlist:1.v2'
+
+
+def test_watchlist_answers_304_until_it_changes(client, signup, new_profile):
+    token, _ = signup()
+    profile_id = new_profile(token)
+    url = f'/api/watchlist/{profile_id}'
+
+    first = get(client, url, token)
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+    etag = etag_of(first)
+
+    not_modified = get(client, url, token, etag)
+    assert not_modified.status_code == 304
+    assert not_modified.data == b''
+    assert etag_of(not_modified) == etag
+
+    client.post(f'{url}/550', json={'movie_title': 'Fight Club'}, headers=bearer(token))
+    changed = get(client, url, token, etag)
+    assert changed.status_code == 200
+    assert etag_of(changed) != etag
+    assert [item['movie_id'] for item in changed.get_json()] == ['550']
+
+    # Adding a title that is already there is not a change
+    client.post(f'{url}/550', json={'movie_title': 'Fight Club'}, headers=bearer(token))
+    assert get(client, url, token, etag_of(changed)).status_code == 304
+
+    client.delete(f'{url}/550', headers=bearer(token))
+    assert get(client, url, token, etag_of(changed)).status_code == 200
+
+
+def test_history_etag_changes_on_every_watch(client, signup, new_profile):
+    token, _ = signup()
+    profile_id = new_profile(token)
+    url = f'/api/history/{profile_id}'
+    etag = etag_of(get(client, url, token))
+
+    client.post(url, json={'movie_id': '550', 'movie_title': 'Fight Club'}, headers=bearer(token))
+    after_first = get(client, url, token, etag)
+    assert after_first.status_code == 200
+
+    client.post(url, json={'movie_id': '550', 'progress_percent': 0.5}, headers=bearer(token))
+    after_progress = get(client, url, token, etag_of(after_first))
+    assert after_progress.status_code == 200
+    assert after_progress.get_json()[0]['progress_percent'] == 0.5
+
+
+def test_profile_list_etag_follows_profile_changes(client, signup, new_profile):
+    token, user_id = signup()
+    url = f'/api/profiles/user/{user_id}'
+    etag = etag_of(get(client, url, token))
+    assert get(client, url, token, etag).status_code == 304
+
+    profile_id = new_profile(token, 'Main')
+    created = get(client, url, token, etag)
+    assert created.status_code == 200
+    assert [profile['name'] for profile in created.get_json()] == ['Main']
+
+    client.put(f'/api/profiles/{profile_id}', json={'name': 'Renamed'}, headers=bearer(token))
+    renamed = get(client, url, token, etag_of(created))
+    assert renamed.status_code == 200
+    assert renamed.get_json()[0]['name'] == 'Renamed'
+    assert get(client, url, token, etag_of(renamed)).status_code == 304
+
+    client.delete(f'/api/profiles/{profile_id}', headers=bearer(token))
+    deleted = get(client, url, token, etag_of(renamed))
+    assert deleted.status_code == 200
+    assert deleted.get_json() == []
+
+
+def test_deleting_a_profile_invalidates_its_watchlist_etag(app, client, signup, new_profile):
+    token, _ = signup()
+    profile_id = new_profile(token)
+    with app.app_context():
+        before = versions.get(f'watchlist:{profile_id}')
+    client.delete(f'/api/profiles/{profile_id}', headers=bearer(token))
+    with app.app_context():
+        assert versions.get(f'watchlist:{profile_id}') == before + 1
+        assert versions.get(f'history:{profile_id}') >= 1
@@ -0,0 +1,32 @@
+import json
+
+from sqlalchemy.exc import ProgrammingError
+
+from app import catalog
+from app.mirror import ingest_dump
+
+
+def test_local_search_before_ingest_is_unavailable(client):
+    response = client.get('/api/catalog/local-search?q=shark')
+    assert response.status_code == 503
+    assert response.get_json()['error'] == 'Local catalog has not been ingested'
+
+
+def test_missing_table_errors_from_other_databases_are_unavailable(client, monkeypatch):
+    def search_local(query, page):
+        raise ProgrammingError('SELECT ...', {}, Exception('relation "catalog_title_fts" does not exist'))
+
+    monkeypatch.setattr(catalog, 'search_local', search_local)
+    assert client.get('/api/catalog/local-search?q=shark').status_code == 503
+
+
+def test_local_search_after_ingest(app, client, tmp_path):
+    dump = tmp_path / 'movies.json'
+    dump.write_text(json.dumps([{'id': 1, 'title': 'Shark Tale', 'poster_path': '/p.jpg',
+                                 'overview': 'A fish story', 'popularity': 10.0}]))
+    with app.app_context():
+        assert ingest_dump(str(dump), 'movie') == 1
+
+    response = client.get('/api/catalog/local-search?q=shar')
+    assert response.status_code == 200
+    assert [item['id'] for item in response.get_json()['results']] == [1]
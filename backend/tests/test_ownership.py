@@ -0,0 +1,88 @@
+import pytest
+
+from app import db
+from app.models import Profile, WatchlistItem
+
+from conftest import bearer
+
+
+@pytest.fixture
+def accounts(signup, new_profile):
+    """Two users with one profile each: ``(owner_token, owner_profile, other_token, other_user, other_profile)``"""
+    owner_token, _ = signup('owner@example.com')
+    other_token, other_user = signup('other@example.com')
+    return owner_token, new_profile(owner_token), other_token, other_user, new_profile(other_token)
+
+
+@pytest.mark.parametrize('method, path', [
+    ('get', '/api/profiles/{profile}'),
+    ('put', '/api/profiles/{profile}'),
+    ('delete', '/api/profiles/{profile}'),
+    ('put', '/api/profiles/{profile}/avatar'),
+    ('get', '/api/watchlist/{profile}'),
+    ('post', '/api/watchlist/{profile}/550'),
+    ('delete', '/api/watchlist/{profile}/550'),
+    ('get', '/api/history/{profile}'),
+    ('post', '/api/history/{profile}'),
+    ('get', '/api/profiles/user/{user}'),
+    ('get', '/api/profiles?user_id={user}'),
+    ('put', '/api/subscription/{user}'),
+])
+def test_other_users_resources_are_not_found(client, accounts, method, path):
+    owner_token, _, _, other_user, other_profile = accounts
+    url = path.format(profile=other_profile, user=other_user)
+    body = {'name': 'Mine now', 'movie_id': '550', 'avatar_data': 'https://example.com/a.png',
+            'subscription_plan': 'premium'}
+    response = getattr(client, method)(url, json=body, headers=bearer(owner_token))
+    assert response.status_code == 404
+
+
+def test_missing_profile_looks_the_same_as_someone_elses(client, accounts):
+    owner_token, _, _, _, other_profile = accounts
+    missing = client.get('/api/profiles/999999', headers=bearer(owner_token))
+    foreign = client.get(f'/api/profiles/{other_profile}', headers=bearer(owner_token))
+    assert missing.status_code == foreign.status_code == 404
+    assert missing.get_json() == foreign.get_json()
+
+
+def test_foreign_requests_change_nothing(app, client, accounts):
+    owner_token, _, other_token, _, other_profile = accounts
+    client.post(f'/api/watchlist/{other_profile}/550', json={'movie_title': 'Fight Club'},
+                headers=bearer(other_token))
+
+    client.delete(f'/api/watchlist/{other_profile}/550', headers=bearer(owner_token))
+    client.delete(f'/api/profiles/{other_profile}', headers=bearer(owner_token))
+    with app.app_context():
+        assert db.session.get(Profile, other_profile) is not None
+        assert WatchlistItem.query.filter_by(profile_id=other_profile).count() == 1
+
+
+def test_owner_can_use_own_profile(client, accounts):
+    owner_token, owner_profile, _, _, _ = accounts
+    assert client.get(f'/api/profiles/{owner_profile}', headers=bearer(owner_token)).status_code == 200
+    assert client.get(f'/api/watchlist/{owner_profile}', headers=bearer(owner_token)).status_code == 200
+
+
+def test_profile_update_accepts_only_editable_fields(app, client, accounts):
+    owner_token, owner_profile, _, other_user, _ = accounts
+    for body in [{'user_id': other_user}, {'id': 12345}, {'name': 'Renamed', 'created_at': None}]:
+        response = client.put(f'/api/profiles/{owner_profile}', json=body, headers=bearer(owner_token))
+        assert response.status_code == 400
+
+    response = client.put(f'/api/profiles/{owner_profile}', json={'name': 'Renamed', 'is_kids': True},
+                          headers=bearer(owner_token))
+    assert response.status_code == 200
+    with app.app_context():
+        profile = db.session.get(Profile, owner_profile)
+        assert (profile.name, profile.is_kids) == ('Renamed', True)
+        assert profile.user_id != other_user
+
+
+def test_deleted_user_token_cannot_reach_profiles(app, client, signup, new_profile):
+    token, user_id = signup()
+    profile_id = new_profile(token)
+    with app.app_context():
+        Profile.query.filter_by(user_id=user_id).delete()
+        db.session.execute(db.text('DELETE FROM users WHERE id = :id'), {'id': user_id})
+        db.session.commit()
+    assert client.get(f'/api/profiles/{profile_id}', headers=bearer(token)).status_code == 401
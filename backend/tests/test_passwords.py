@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from app.passwords import HasherBusy, PasswordHasher, normalize_method, stored_method
+from werkzeug.security import generate_password_hash
+
+
+def wait_for(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+
+def test_methods_are_normalized_to_what_werkzeug_stores():
+    password_hash = generate_password_hash('secret', 'pbkdf2:sha256')
+    assert stored_method(password_hash) == normalize_method('pbkdf2:sha256')
+    assert normalize_method('scrypt') == 'scrypt:32768:8:1'
+
+
+def test_verify_rehashes_under_a_new_policy():
+    hasher = PasswordHasher()
+    hasher.workers = 0
+    old_hash = generate_password_hash('secret', 'pbkdf2:sha256:1000')
+    assert hasher.verify(old_hash, 'wrong') == (False, None)
+    valid, new_hash = hasher.verify(old_hash, 'secret')
+    assert valid
+    assert stored_method(new_hash) == hasher.method
+    assert hasher.verify(new_hash, 'secret') == (True, None)
+
+
+def test_timed_out_hash_raises_busy_and_keeps_its_slot():
+    hasher = PasswordHasher()
+    hasher.workers = 1
+    hasher.max_pending = 1
+    hasher.timeout = 0.01
+    try:
+        with pytest.raises(HasherBusy):
+            hasher._run(time.sleep, 1)
+        assert hasher.stats()['timed_out'] == 1
+        # Still running in the pool, so it still counts against the limit
+        assert hasher.stats()['pending'] == 1
+        with pytest.raises(HasherBusy):
+            hasher._run(time.sleep, 0)
+        assert hasher.stats()['rejected_busy'] == 1
+
+        wait_for(lambda: hasher.stats()['pending'] == 0)
+        hasher.timeout = 30
+        assert hasher._run(max, 1, 2) == 2
+        assert hasher.stats()['pending'] == 0
+    finally:
+        hasher.pool.shutdown()
+
+
+@pytest.fixture
+def app_env():
+    return {'PASSWORD_HASH_WORKERS': '1'}
+
+
+def test_hashing_timeout_answers_503_with_retry_after(app, client):
+    from app.passwords import hasher
+    timeout, hasher.timeout = hasher.timeout, 0.001
+    try:
+        response = client.post('/api/auth/register', json={'email': 'slow@example.com', 'password': 'secret'})
+    finally:
+        hasher.timeout = timeout
+        wait_for(lambda: hasher.stats()['pending'] == 0)
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
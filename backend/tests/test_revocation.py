@@ -0,0 +1,60 @@
+import time
+
+from app.auth import verify_token
+from app.revocation import BloomFilter, RevocationList
+
+from conftest import bearer
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000)
+    items = [f'jti-{number}' for number in range(1000)]
+    for item in items:
+        bloom.add(item)
+    assert all(item in bloom for item in items)
+    false_positives = sum(f'other-{number}' in bloom for number in range(10000))
+    assert false_positives < 300
+
+
+def test_logout_revokes_the_token(client, signup):
+    token, _ = signup()
+    assert client.get('/api/auth/me', headers=bearer(token)).status_code == 200
+
+    assert client.post('/api/auth/logout', headers=bearer(token)).status_code == 200
+    response = client.get('/api/auth/me', headers=bearer(token))
+    assert response.status_code == 401
+    assert response.get_json()['error'] == 'Token has been revoked'
+    # Logging out twice with the same token is refused, not an error
+    assert client.post('/api/auth/logout', headers=bearer(token)).status_code == 401
+
+
+def test_logout_leaves_other_sessions_signed_in(client, signup):
+    token, _ = signup('viewer@example.com', 'secret pass')
+    other = client.post('/api/auth/login', json={'email': 'viewer@example.com', 'password': 'secret pass'})
+    other_token = other.get_json()['access_token']
+
+    client.post('/api/auth/logout', headers=bearer(token))
+    assert client.get('/api/auth/me', headers=bearer(other_token)).status_code == 200
+
+
+def test_revocation_reaches_other_workers(app, client, signup):
+    token, _ = signup()
+    with app.app_context():
+        jti = verify_token(token)['jti']
+        # Another worker's list, loaded before the logout
+        worker = RevocationList(refresh_interval=0)
+        assert not worker.is_revoked(jti)
+
+    client.post('/api/auth/logout', headers=bearer(token))
+    with app.app_context():
+        assert worker.is_revoked(jti)
+        assert not worker.is_revoked('never-issued')
+
+
+def test_expired_revocations_are_pruned_on_rebuild(app):
+    with app.app_context():
+        revocations = RevocationList(refresh_interval=0, rebuild_interval=0)
+        revocations.revoke('expired', time.time() - 10)
+        revocations.revoke('current', time.time() + 3600)
+        assert revocations.is_revoked('current')
+        assert not revocations.is_revoked('expired')
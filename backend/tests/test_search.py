@@ -0,0 +1,55 @@
+from app.search import MAX_PAGES_PER_REQUEST, PAGE_SIZE, decode_cursor, merge_page
+from app.tmdb import tmdb
+
+
+def item(number):
+    return {'id': number, 'title': f'Title {number}', 'poster_path': '/p.jpg', 'overview': 'Plot',
+            'popularity': 1000 - number}
+
+
+def fake_search(monkeypatch, pages):
+    """Serve ``pages[media_type]`` as upstream search pages and record each fetch"""
+    fetched = []
+
+    def get_json(path, params):
+        media_type = path.split('/')[1]
+        fetched.append((media_type, params['page']))
+        source = pages.get(media_type, [])
+        results = source[params['page'] - 1] if params['page'] <= len(source) else []
+        return {'results': results, 'total_pages': len(source)}
+
+    monkeypatch.setattr(tmdb, 'get_json', get_json)
+    return fetched
+
+
+def test_sparse_results_are_walked_a_few_pages_per_request(monkeypatch):
+    invalid = [{'id': 0, 'title': 'Broken'}] * 20
+    movie_pages = [invalid] * 10 + [[item(1)]]
+    fetched = fake_search(monkeypatch, {'movie': movie_pages})
+
+    state = decode_cursor(None)
+    results = []
+    requests = 0
+    while True:
+        before = len(fetched)
+        page = merge_page('shark', state)
+        requests += 1
+        assert len(fetched) - before <= 2 * MAX_PAGES_PER_REQUEST
+        results.extend(page['results'])
+        if not page['hasNextPage']:
+            break
+        state = decode_cursor(page['nextCursor'])
+
+    assert [result['id'] for result in results] == [1]
+    assert requests == 4
+    assert sorted(page for media_type, page in fetched if media_type == 'movie') == list(range(1, 12))
+
+
+def test_full_pages_do_not_stop_early(monkeypatch):
+    fake_search(monkeypatch, {
+        'movie': [[item(number) for number in range(1, 21)]],
+        'tv': [[dict(item(number), name='Show') for number in range(21, 41)]],
+    })
+    page = merge_page('shark', decode_cursor(None))
+    assert len(page['results']) == PAGE_SIZE
+    assert page['hasNextPage']
@@ -0,0 +1,83 @@
+import pytest
+
+from app.throttle import SlidingWindowTable, parse_rule
+
+
+@pytest.fixture
+def app_env():
+    return {
+        'THROTTLE_LOGIN_PER_EMAIL': '3/60',
+        'THROTTLE_LOGIN_PER_IP': '100/60',
+        'THROTTLE_REGISTER_PER_IP': '2/3600',
+    }
+
+
+def login(client, email, password='wrong password'):
+    return client.post('/api/auth/login', json={'email': email, 'password': password})
+
+
+def test_parse_rule():
+    assert parse_rule('10/60') == (10, 60.0)
+    assert parse_rule('5') == (5, 60.0)
+
+
+def test_login_is_throttled_per_email(client, signup):
+    signup('target@example.com', 'right password')
+    for _ in range(3):
+        assert login(client, 'target@example.com').status_code == 400
+
+    response = login(client, 'target@example.com', 'right password')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    # Case and surrounding spaces don't give a fresh budget
+    assert login(client, '  TARGET@example.com ').status_code == 429
+    # Other accounts are unaffected
+    assert login(client, 'other@example.com').status_code == 400
+
+
+def test_register_is_throttled_per_ip(client, signup):
+    signup('one@example.com')
+    signup('two@example.com')
+    response = client.post('/api/auth/register', json={'email': 'three@example.com', 'password': 'x'})
+    assert response.status_code == 429
+    assert 'Retry-After' in response.headers
+
+
+def test_non_string_credentials_get_a_client_error(client):
+    for body in [{'email': 5}, {'email': ['a@example.com'], 'password': 'x'}, {'email': 'a@example.com', 'password': 5}]:
+        assert client.post('/api/auth/login', json=body).status_code == 400
+    for body in [{'email': {'a': 1}, 'password': 'x'}, {'email': 'a@example.com', 'password': ['x']}]:
+        assert client.post('/api/auth/register', json=body).status_code == 400
+
+
+def test_table_is_shared_between_workers(tmp_path):
+    first = SlidingWindowTable(str(tmp_path / 'table.bin'), slots=64)
+    second = SlidingWindowTable(str(tmp_path / 'table.bin'), slots=64)
+    assert first.hit('rule', 'key', 2, 60) == (True, 0)
+    assert second.hit('rule', 'key', 2, 60) == (True, 0)
+    allowed, retry_after = first.hit('rule', 'key', 2, 60)
+    assert not allowed
+    assert retry_after >= 1
+    assert second.hit('rule', 'other key', 2, 60) == (True, 0)
+
+
+def test_table_stays_bounded_when_slots_are_full(tmp_path):
+    table = SlidingWindowTable(str(tmp_path / 'table.bin'), slots=8)
+    for number in range(100):
+        assert table.hit('rule', f'key {number}', 1, 60)[0]
+    stats = table.stats()
+    assert stats['occupied'] <= stats['slots'] + 4
+    assert stats['evictions'] > 0
+
+
+def test_stats_endpoints_are_hidden_by_default(client):
+    assert client.get('/api/auth/stats').status_code == 404
+    assert client.get('/api/catalog/stats').status_code == 404
+
+
+def test_stats_endpoints_can_be_enabled(app, client):
+    app.config['STATS_ENDPOINTS_ENABLED'] = True
+    stats = client.get('/api/auth/stats')
+    assert stats.status_code == 200
+    assert set(stats.get_json()) == {'throttle', 'password_hashing', 'revocation', 'profile_lists'}
+    assert client.get('/api/catalog/stats').status_code == 200
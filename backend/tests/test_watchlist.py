@@ -0,0 +1,98 @@
+import os
+import threading
+
+import sqlalchemy as sa
+from flask_migrate import upgrade
+
+from app import db
+from app.models import WatchlistItem
+from app.watchlist import add_item, remove_item
+
+from conftest import bearer
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+
+def test_add_and_remove_report_whether_anything_changed(client, signup, new_profile):
+    token, _ = signup()
+    url = f'/api/watchlist/{new_profile(token)}/550'
+
+    first = client.post(url, json={'movie_title': 'Fight Club'}, headers=bearer(token))
+    assert first.status_code == 200
+    assert first.get_json()['added'] is True
+    assert first.get_json()['item']['movie_title'] == 'Fight Club'
+
+    again = client.post(url, json={'movie_title': 'Fight Club'}, headers=bearer(token))
+    assert again.status_code == 200
+    assert again.get_json()['added'] is False
+
+    assert client.delete(url, headers=bearer(token)).status_code == 200
+    assert client.delete(url, headers=bearer(token)).status_code == 404
+
+
+def test_concurrent_adds_insert_one_row(app, signup, new_profile):
+    token, _ = signup()
+    profile_id = new_profile(token)
+    results, errors = [], []
+    start = threading.Barrier(8)
+
+    def add():
+        with app.app_context():
+            start.wait()
+            try:
+                results.append(add_item(profile_id, '550', movie_title='Fight Club') is not None)
+            except Exception as e:
+                errors.append(e)
+            db.session.remove()
+
+    threads = [threading.Thread(target=add) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert results.count(True) == 1
+    with app.app_context():
+        assert WatchlistItem.query.filter_by(profile_id=profile_id, movie_id='550').count() == 1
+        assert remove_item(profile_id, '550')
+        assert not remove_item(profile_id, '550')
+
+
+def test_unique_index_rejects_duplicate_rows(app, signup, new_profile):
+    token, _ = signup()
+    profile_id = new_profile(token)
+    with app.app_context():
+        db.session.add(WatchlistItem(profile_id=profile_id, movie_id='550', movie_title='Fight Club'))
+        db.session.commit()
+        db.session.add(WatchlistItem(profile_id=profile_id, movie_id='550', movie_title='Fight Club'))
+        try:
+            db.session.commit()
+        except sa.exc.IntegrityError:
+            db.session.rollback()
+        else:
+            raise AssertionError('duplicate watchlist row was accepted')
+
+
+def test_migrations_bring_an_old_database_up_to_date(app, signup, new_profile):
+    token, _ = signup()
+    profile_id = new_profile(token)
+    with app.app_context():
+        # Roll the schema back to what the baseline's create_all made
+        db.session.execute(sa.text('DROP INDEX uq_watchlist_item_profile_id_movie_id'))
+        for table in ['resource_version', 'revoked_token', 'title_eligibility', 'title_certification',
+                      'home_row', 'catalog_title']:
+            db.session.execute(sa.text(f'DROP TABLE {table}'))
+        for _ in range(3):
+            db.session.execute(WatchlistItem.__table__.insert().values(
+                profile_id=profile_id, movie_id='550', movie_title='Fight Club'))
+        db.session.commit()
+
+        upgrade(directory=MIGRATIONS)
+
+        inspector = sa.inspect(db.engine)
+        assert {'resource_version', 'revoked_token', 'title_eligibility', 'title_certification',
+                'home_row', 'catalog_title'} <= set(inspector.get_table_names())
+        unique = {index['name'] for index in inspector.get_indexes('watchlist_item') if index['unique']}
+        assert 'uq_watchlist_item_profile_id_movie_id' in unique
+        assert WatchlistItem.query.filter_by(profile_id=profile_id, movie_id='550').count() == 1
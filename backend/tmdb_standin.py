@@ -0,0 +1,389 @@
+"""Local stand-in for the TMDb API used by benchmarks, load tests and offline development.
+
+Synthesizes deterministic responses for every path the frontend's movieAPI
+uses, and replays recorded ones from a fixtures file when there is one. Latency, error
+rates and rate limiting can be injected so cache hit ratios, coalescing and
+degradation can be measured without a network.
+
+    $ python tmdb_standin.py --port 8765 --latency lognormal:40,0.5 --error-rate 0.01
+    $ TMDB_BASE_URL=http://127.0.0.1:8765/3 TMDB_IMAGE_BASE_URL=http://127.0.0.1:8765/t/p python run.py
+
+Record real responses into the fixtures file (needs network and a key):
+
+    $ TMDB_API_KEY=... python tmdb_standin.py --record
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'tmdb.json')
+REAL_TMDB_URL = 'https://api.themoviedb.org/3'
+# Query parameters that change a response; api_key and the like are ignored
+KEY_PARAMS = ('language', 'with_networks', 'with_genres', 'query', 'page', 'include_adult', 'sort_by')
+NOT_FOUND = {'success': False, 'status_code': 34, 'status_message': 'The resource you requested could not be found.'}
+
+
+def fixture_key(path, query):
+    params = urllib.parse.parse_qs(query)
+    kept = sorted((key, params[key][0]) for key in KEY_PARAMS if key in params)
+    return f"{path.strip('/')}?{urllib.parse.urlencode(kept)}"
+
+
+def seeded(key):
+    return random.Random(int(hashlib.sha1(key.encode()).hexdigest()[:16], 16))
+
+
+class LatencyModel:
+    """Parses ``fixed:50``, ``uniform:20,80``, ``normal:50,10`` or ``lognormal:40,0.5`` (milliseconds)"""
+
+    def __init__(self, spec='fixed:0'):
+        kind, _, args = spec.partition(':')
+        values = [float(value) for value in args.split(',') if value]
+        if kind not in ('fixed', 'uniform', 'normal', 'lognormal'):
+            raise ValueError(f'Unknown latency distribution: {kind}')
+        self.kind = kind
+        self.values = values or [0.0]
+
+    def sample(self, rng):
+        if self.kind == 'fixed':
+            ms = self.values[0]
+        elif self.kind == 'uniform':
+            ms = rng.uniform(self.values[0], self.values[1])
+        elif self.kind == 'normal':
+            ms = rng.gauss(self.values[0], self.values[1])
+        else:
+            # Median of values[0] ms with a long right tail
+            ms = self.values[0] * rng.lognormvariate(0, self.values[1])
+        return max(ms, 0.0) / 1000
+
+
+class RateLimiter:
+    """Token bucket matching TMDb's behaviour of answering 429 with Retry-After"""
+
+    def __init__(self, spec=None):
+        self.capacity = 0
+        if spec:
+            requests, _, seconds = spec.partition('/')
+            self.capacity = int(requests)
+            self.rate = self.capacity / float(seconds or 1)
+            self.tokens = float(self.capacity)
+            self.updated = time.monotonic()
+            self.lock = threading.Lock()
+
+    def allow(self):
+        if not self.capacity:
+            return True, 0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True, 0
+            return False, (1 - self.tokens) / self.rate
+
+
+class Synthesizer:
+    """Deterministic TMDb-shaped responses for any id, page or query"""
+
+    GENRES = [(28, 'Action'), (35, 'Comedy'), (27, 'Horror'), (10749, 'Romance'), (99, 'Documentary'), (18, 'Drama')]
+    WORDS = ['Shark', 'Ocean', 'Night', 'Storm', 'Reef', 'Hunter', 'City', 'Deep', 'Blue', 'Tide', 'Signal', 'Harbor']
+
+    def item(self, rng, media_type, tmdb_id=None, title_word=None):
+        tmdb_id = tmdb_id or rng.randint(1, 999999)
+        title = ' '.join(rng.sample(self.WORDS, 2))
+        if title_word:
+            title = f'{title_word.title()} {title}'
+        item = {
+            'id': tmdb_id,
+            'overview': f'{title} is a stand-in title generated for offline testing.',
+            'poster_path': f'/poster{tmdb_id}.jpg' if rng.random() < 0.95 else None,
+            'backdrop_path': f'/backdrop{tmdb_id}.jpg' if rng.random() < 0.9 else None,
+            'popularity': round(rng.uniform(1, 1000), 3),
+            'vote_average': round(rng.uniform(4, 9), 1),
+            'vote_count': rng.randint(0, 20000),
+            'genre_ids': [genre_id for genre_id, _ in rng.sample(self.GENRES, 2)],
+            'original_language': 'en',
+            'media_type': media_type,
+        }
+        date = f'{rng.randint(1980, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}'
+        if media_type == 'movie':
+            item.update(title=title, original_title=title, release_date=date)
+        else:
+            item.update(name=title, original_name=title, first_air_date=date)
+        return item
+
+    def page(self, rng, media_type, page, query=None, total_pages=5):
+        results = []
+        for _ in range(20):
+            item = self.item(rng, media_type or rng.choice(['movie', 'tv']),
+                             title_word=query.split()[0] if query else None)
+            if media_type:
+                # Only mixed lists like trending carry media_type
+                item.pop('media_type')
+            results.append(item)
+        return {'page': page, 'results': results, 'total_pages': total_pages, 'total_results': total_pages * 20}
+
+    def respond(self, path, query):
+        params = {key: values[0] for key, values in urllib.parse.parse_qs(query).items()}
+        rng = seeded(fixture_key(path, query))
+        page = int(params.get('page', 1) or 1)
+
+        if path == 'trending/all/week':
+            return self.page(rng, None, page)
+        if path == 'movie/top_rated':
+            return self.page(rng, 'movie', page)
+        match = re.match(r'^(discover|search)/(movie|tv)$', path)
+        if match:
+            query_text = params.get('query', '') if match.group(1) == 'search' else None
+            if query_text is not None and not query_text.strip():
+                return {'page': 1, 'results': [], 'total_pages': 0, 'total_results': 0}
+            return self.page(rng, match.group(2), page, query=query_text, total_pages=rng.randint(1, 8))
+
+        match = re.match(r'^(movie|tv)/(\d+)(?:/(\w+))?$', path)
+        if not match:
+            return None
+        media_type, tmdb_id, part = match.group(1), int(match.group(2)), match.group(3)
+        rng = seeded(f'{media_type}/{tmdb_id}')
+        if part is None:
+            details = self.item(rng, media_type, tmdb_id)
+            details.pop('media_type')
+            details['genres'] = [{'id': genre_id, 'name': name} for genre_id, name in self.GENRES[:2]]
+            if media_type == 'movie':
+                details['runtime'] = rng.randint(80, 180)
+            else:
+                details['number_of_seasons'] = rng.randint(1, 8)
+            return details
+        if part == 'videos':
+            results = []
+            if rng.random() < 0.8:
+                results.append({'key': f'yt{tmdb_id}', 'site': 'YouTube', 'type': 'Trailer',
+                                'official': True, 'name': 'Official Trailer', 'iso_639_1': 'en'})
+            if rng.random() < 0.5:
+                results.append({'key': f'yt{tmdb_id}t', 'site': 'YouTube', 'type': 'Teaser',
+                                'official': False, 'name': 'Teaser', 'iso_639_1': 'en'})
+            return {'id': tmdb_id, 'results': results}
+        if part == 'images':
+            logos = [{'file_path': f'/logo{tmdb_id}.png', 'iso_639_1': 'en'}] if rng.random() < 0.85 else []
+            return {'id': tmdb_id, 'logos': logos,
+                    'backdrops': [{'file_path': f'/backdrop{tmdb_id}.jpg'}],
+                    'posters': [{'file_path': f'/poster{tmdb_id}.jpg'}]}
+        if part == 'credits':
+            return {'id': tmdb_id,
+                    'cast': [{'id': rng.randint(1, 99999), 'name': f'Actor {i}', 'character': f'Role {i}'}
+                             for i in range(10)],
+                    'crew': [{'id': rng.randint(1, 99999), 'name': 'Director', 'job': 'Director'}]}
+        if part == 'similar':
+            return self.page(rng, media_type, page, total_pages=2)
+        if part == 'release_dates' and media_type == 'movie':
+            return {'id': tmdb_id, 'results': [
+                {'iso_3166_1': 'US', 'release_dates': [{'certification': rng.choice(['G', 'PG', 'PG-13', 'R']),
+                                                        'type': 3}]},
+                {'iso_3166_1': 'GB', 'release_dates': [{'certification': rng.choice(['U', 'PG', '12A', '15', '18']),
+                                                        'type': 3}]},
+            ]}
+        if part == 'content_ratings' and media_type == 'tv':
+            return {'id': tmdb_id, 'results': [
+                {'iso_3166_1': 'US', 'rating': rng.choice(['TV-G', 'TV-PG', 'TV-14', 'TV-MA'])},
+                {'iso_3166_1': 'GB', 'rating': rng.choice(['U', 'PG', '12', '15', '18'])},
+            ]}
+        return None
+
+
+def synthetic_image(file_name, size):
+    """A small solid-colour image so the image proxy has real bytes to resize"""
+    from PIL import Image
+
+    rng = seeded(file_name)
+    is_logo = file_name.endswith('.png')
+    width = 500 if size == 'original' else int(size.lstrip('w') or 500)
+    height = width // 3 if is_logo else width * 3 // 2
+    colour = (rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255))
+    image = Image.new('RGBA' if is_logo else 'RGB', (width, height), colour + ((200,) if is_logo else ()))
+    buffer = BytesIO()
+    image.save(buffer, format='PNG' if is_logo else 'JPEG', quality=80)
+    return buffer.getvalue()
+
+
+class StandIn:
+    """The stand-in server; usable from tests and load scripts as well as the command line"""
+
+    def __init__(self, host='127.0.0.1', port=8765, fixtures=DEFAULT_FIXTURES, latency='fixed:0',
+                 error_rate=0.0, rate_limit=None, synthetic=True, seed=None, record=False):
+        self.host = host
+        self.port = port
+        self.fixtures_path = fixtures
+        self.fixtures = {}
+        if fixtures and os.path.exists(fixtures):
+            with open(fixtures) as fixtures_file:
+                self.fixtures = json.load(fixtures_file)
+        self.latency = LatencyModel(latency)
+        self.error_rate = error_rate
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.synthetic = synthetic
+        self.synthesizer = Synthesizer()
+        self.record = record
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.reset_stats()
+        self.server = None
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.stats = {'requests': 0, 'fixture_hits': 0, 'synthetic': 0, 'recorded': 0,
+                          'not_found': 0, 'errors': 0, 'throttled': 0, 'paths': {}}
+
+    def count(self, name, path=None):
+        with self.stats_lock:
+            self.stats[name] += 1
+            if path is not None:
+                self.stats['paths'][path] = self.stats['paths'].get(path, 0) + 1
+
+    def draw(self):
+        with self.rng_lock:
+            return self.rng.random(), self.latency.sample(self.rng)
+
+    def record_response(self, key, path, query):
+        params = urllib.parse.parse_qs(query)
+        params['api_key'] = [os.environ['TMDB_API_KEY']]
+        url = f"{REAL_TMDB_URL}/{path}?{urllib.parse.urlencode(params, doseq=True)}"
+        with urllib.request.urlopen(url, timeout=10) as response:
+            body = json.loads(response.read())
+        with self.stats_lock:
+            self.fixtures[key] = body
+            os.makedirs(os.path.dirname(self.fixtures_path), exist_ok=True)
+            with open(self.fixtures_path, 'w') as fixtures_file:
+                json.dump(self.fixtures, fixtures_file, indent=1, sort_keys=True)
+        self.count('recorded')
+        return body
+
+    def resolve(self, path, query):
+        """Return ``(status, body)`` for an API path"""
+        key = fixture_key(path, query)
+        if key in self.fixtures:
+            self.count('fixture_hits')
+            return 200, self.fixtures[key]
+        if self.record:
+            return 200, self.record_response(key, path, query)
+        body = self.synthesizer.respond(path, query) if self.synthetic else None
+        if body is None:
+            self.count('not_found')
+            return 404, NOT_FOUND
+        self.count('synthetic')
+        return 200, body
+
+    def handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def send(self, status, body, content_type='application/json', headers=None):
+                if not isinstance(body, bytes):
+                    body = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urllib.parse.urlparse(self.path)
+                if url.path == '/__stats':
+                    with standin.stats_lock:
+                        return self.send(200, standin.stats)
+                if url.path == '/__reset':
+                    standin.reset_stats()
+                    return self.send(200, {'reset': True})
+
+                standin.count('requests', url.path)
+                roll, delay = standin.draw()
+                if delay:
+                    time.sleep(delay)
+
+                allowed, retry_after = standin.rate_limiter.allow()
+                if not allowed:
+                    standin.count('throttled')
+                    return self.send(429, {'status_code': 25, 'status_message': 'Request count over limit.'},
+                                     headers={'Retry-After': str(max(1, round(retry_after)))})
+                if roll < standin.error_rate:
+                    standin.count('errors')
+                    return self.send(503, {'status_code': 11, 'status_message': 'Internal error.'})
+
+                image = re.match(r'^/t/p/(w\d+|original)/([\w\-]+\.(?:jpg|png))$', url.path)
+                if image:
+                    content_type = 'image/png' if image.group(2).endswith('.png') else 'image/jpeg'
+                    return self.send(200, synthetic_image(image.group(2), image.group(1)), content_type)
+
+                if not url.path.startswith('/3/'):
+                    standin.count('not_found')
+                    return self.send(404, NOT_FOUND)
+                status, body = standin.resolve(url.path[len('/3/'):], url.query)
+                return self.send(status, body)
+
+        return Handler
+
+    def start(self):
+        """Serve on a background thread; returns the API base URL"""
+        self.server = ThreadingHTTPServer((self.host, self.port), self.handler())
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, name='tmdb-standin', daemon=True).start()
+        return self.base_url
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    @property
+    def base_url(self):
+        return f'http://{self.host}:{self.port}/3'
+
+    @property
+    def image_base_url(self):
+        return f'http://{self.host}:{self.port}/t/p'
+
+    def serve_forever(self):
+        self.server = ThreadingHTTPServer((self.host, self.port), self.handler())
+        self.server.daemon_threads = True
+        print(f"TMDb stand-in serving {self.base_url} (images at {self.image_base_url})")
+        self.server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--fixtures', default=DEFAULT_FIXTURES, help='JSON file of recorded responses.')
+    parser.add_argument('--latency', default='fixed:0',
+                        help='fixed:MS, uniform:MIN,MAX, normal:MEAN,SD or lognormal:MEDIAN,SIGMA')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 503.')
+    parser.add_argument('--rate-limit', help='Token bucket as REQUESTS/SECONDS, e.g. 40/10.')
+    parser.add_argument('--strict', action='store_true', help='404 for anything not in the fixtures.')
+    parser.add_argument('--seed', type=int, help='Seed for latency and error injection.')
+    parser.add_argument('--record', action='store_true',
+                        help='Fetch unrecorded paths from TMDb (TMDB_API_KEY) and save them as fixtures.')
+    args = parser.parse_args()
+
+    StandIn(args.host, args.port, args.fixtures, args.latency, args.error_rate, args.rate_limit,
+            synthetic=not args.strict, seed=args.seed, record=args.record).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
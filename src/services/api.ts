@@ -160,11 +160,16 @@ export const historyAPI = {
 };
 
 export const subscriptionAPI = {
-  updateSubscription: (userId: string, subscriptionPlan: string) =>
-    handleRequest(
+  updateSubscription: async (userId: string, subscriptionPlan: string) => {
+    const data = await handleRequest<{ subscription_plan: string; access_token?: string }>(
       () => api.put(`/subscription/${userId}`, { subscription_plan: subscriptionPlan }),
       "Failed to update subscription"
-    ),
+    );
+    if (data.access_token) {
+      localStorage.setItem("shark_streamer_token", data.access_token);
+    }
+    return data;
+  },
 
   getPlans: (): Promise<PlansResponse> => handleRequest<PlansResponse>(() => api.get("/plans"), "Failed to get plans"),
 };